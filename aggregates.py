@@ -0,0 +1,105 @@
+import threading
+
+import numpy as np
+
+from loader import quarter_columns
+
+
+class TopicAggregates:
+    # Cross-topic rankings and totals over one LookupStore. Column totals are
+    # computed up front; the descending sort order of a column (or of a
+    # quarter-to-quarter growth column) is computed on first use and cached,
+    # so every later ranking over it is a slice.
+    def __init__(self, store, total_column="sum value"):
+        self.store = store
+        by_row = sorted((row, topic) for topic, row in store.topic_index.items())
+        self.rows = np.array([row for row, _ in by_row], dtype=np.int64)
+        self.topics = [topic for _, topic in by_row]
+        self.positions = {topic: i for i, topic in enumerate(self.topics)}
+        self.total_column = total_column if store.column(total_column) is not None else None
+        self.quarter_columns = [col for col, _ in quarter_columns(store.columns)]
+        self.totals = {}
+        for col, values in store.columns.items():
+            values = values[self.rows]
+            present = ~np.isnan(values)
+            self.totals[col] = (float(values[present].sum()), int(present.sum()))
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.topics)
+
+    def values(self, column):
+        values = self.store.column(column)
+        return values[self.rows] if values is not None else None
+
+    def row_totals(self):
+        # The sheet's own "Sum Value" column when it has one.
+        if self.total_column:
+            return self.values(self.total_column)
+        if not self.quarter_columns:
+            return np.full(len(self.rows), np.nan)
+        block = np.column_stack([self.values(col) for col in self.quarter_columns])
+        totals = np.nansum(block, axis=1)
+        totals[np.isnan(block).all(axis=1)] = np.nan
+        return totals
+
+    def growth(self, first, second):
+        before, after = self.values(first), self.values(second)
+        if before is None or after is None:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = (after - before) / before * 100
+        change[~np.isfinite(change)] = np.nan
+        return change
+
+    def _sorted(self, key, compute):
+        with self._lock:
+            cached = self._orders.get(key)
+        if cached is None:
+            values = compute()
+            if values is None:
+                return None
+            valid = np.flatnonzero(~np.isnan(values))
+            cached = (values, valid[np.argsort(-values[valid], kind="stable")])
+            with self._lock:
+                self._orders[key] = cached
+        return cached
+
+    def _top(self, key, compute, k, ascending):
+        cached = self._sorted(key, compute)
+        if cached is None:
+            return None
+        values, order = cached
+        picked = order[::-1][:k] if ascending else order[:k]
+        return [(self.topics[i], float(values[i])) for i in picked]
+
+    def rank(self, column=None, k=5, ascending=False):
+        # column None ranks by each topic's total.
+        if column is None:
+            return self._top("total", self.row_totals, k, ascending)
+        column = self.store.aliases.get(column, column)
+        return self._top(column, lambda: self.values(column), k, ascending)
+
+    def rank_growth(self, first, second, k=1, ascending=False):
+        first, second = self.store.aliases.get(first, first), self.store.aliases.get(second, second)
+        return self._top(("growth", first, second), lambda: self.growth(first, second), k, ascending)
+
+    def total(self, column=None):
+        # Sum over all topics and how many had a value.
+        if column is None:
+            if self.total_column:
+                return self.totals[self.total_column]
+            totals = self._sorted("total", self.row_totals)[0]
+            present = ~np.isnan(totals)
+            return float(totals[present].sum()), int(present.sum())
+        return self.totals.get(self.store.aliases.get(column, column))
+
+    def get(self, topic, column=None):
+        if column is not None:
+            return self.store.get(topic, column)
+        i = self.positions.get(topic)
+        if i is None:
+            return None
+        value = self._sorted("total", self.row_totals)[0][i]
+        return None if np.isnan(value) else float(value)
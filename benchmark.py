@@ -0,0 +1,345 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from fuzzywuzzy import process
+
+from config import MODEL_CONFIG
+from matcher import FuzzyTopicIndex
+
+SYLLABLES = ["ka", "ri", "sha", "an", "vi", "ra", "jo", "mee", "nu", "dev", "pra", "ti", "lo", "sa", "hi", "ku", "mar", "ya"]
+
+
+def synthetic_names(count, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        first = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        names.add(f"{first} {last}")
+    return sorted(names)
+
+
+def _misspell(name, rng):
+    chars = list(name)
+    i = rng.randrange(len(chars))
+    if chars[i] != " ":
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(chars)
+
+
+def _latency_summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+
+def bench_fuzzy(topics=1000, queries=50, seed=0):
+    names = synthetic_names(topics, seed)
+    rng = random.Random(seed + 1)
+    targets = [rng.choice(names) for _ in range(queries)]
+    questions = [f"what was {_misspell(name, rng)} revenue in the third quarter" for name in targets]
+
+    def extract_one(question):
+        best_match, score = process.extractOne(question, names)
+        return best_match.strip().lower() if score > 60 else None
+
+    start = time.perf_counter()
+    index = FuzzyTopicIndex(names)
+    build_seconds = time.perf_counter() - start
+
+    results = {}
+    for label, resolve in [("extract_one", extract_one), ("fuzzy_index", index._resolve)]:
+        answers, seconds = [], []
+        for question in questions:
+            start = time.perf_counter()
+            answers.append(resolve(question))
+            seconds.append(time.perf_counter() - start)
+        results[label] = dict(
+            _latency_summary(seconds),
+            accuracy=sum(a == t for a, t in zip(answers, targets)) / queries,
+        )
+        results[label]["answers"] = answers
+
+    baseline = results["extract_one"].pop("answers")
+    indexed = results["fuzzy_index"].pop("answers")
+    results["fuzzy_index"]["build_ms"] = build_seconds * 1000
+    results["fuzzy_index"]["recall_vs_extract_one"] = sum(a == b for a, b in zip(baseline, indexed)) / queries
+    return {"benchmark": "fuzzy", "topics": topics, "queries": queries, "results": results}
+
+
+STARTUP_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from config import MODEL_CONFIG
+MODEL_CONFIG.update(qa_mode=sys.argv[1])
+from qa_pipeline import FinancialQASystem
+imported = time.perf_counter()
+qa = FinancialQASystem(csv_path=sys.argv[2])
+ready = time.perf_counter()
+result = {"import_s": imported - start, "init_s": ready - imported}
+try:
+    if qa.qa_pipeline is not None:
+        result["qa_model_load_s"] = time.perf_counter() - ready
+except Exception as e:
+    result["qa_model_error"] = repr(e)
+result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+
+def bench_startup(csv_path=None):
+    # Each mode runs in a fresh interpreter so imports and RSS are not shared.
+    csv_path = csv_path or MODEL_CONFIG["csv_path"]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for mode in ["rules", "full"]:
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE, mode, csv_path],
+            cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+    return {"benchmark": "startup", "csv_path": csv_path, "results": results}
+
+
+# One template per branch of answer_query / handle_complex_query.
+QUESTION_TEMPLATES = {
+    "lookup": "What is the value of {name} in Q{a}?",
+    "next_year": "Show {name} in Q{a} of next year",
+    "yesno": "Did {name} increase from Q{a} to Q{b}?",
+    "growth": "What is the growth of {name} from Q{a} to Q{b}?",
+    "year_over_year": "What is the growth of {name} year over year?",
+    "comparison": "Compare {name} in Q{a} vs Q{b}",
+    "forecast": "Forecast {name} revenue for the next quarter",
+    "free_form": "Tell me about {name}",
+    "unknown_topic": "How is business going?",
+    "top_heads": "Top 5 heads by Q{a} revenue",
+    "fastest_growth": "Who grew fastest from Q{a} to Q{b}?",
+    "total": "Total Q{a} across all heads",
+    "compare_heads": "Compare {name} vs {other} in Q{a}",
+}
+
+
+def bench_backtest(csv_path=None, fitted_forests=False, workers=None):
+    # Walk-forward model selection on a sheet: the time to fit and select
+    # every head's model, and each candidate's out-of-sample errors.
+    from loader import load_csv
+    from ml_predictor import ClosedFormModels
+
+    csv_path = csv_path or MODEL_CONFIG["csv_path"]
+    df = load_csv(csv_path, lowercase_columns=True)
+    start = time.perf_counter()
+    closed_form = ClosedFormModels.from_frame(df, MODEL_CONFIG["topic_column"])
+    select_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    report = closed_form.backtest(fitted_forests=fitted_forests, workers=workers)
+    return dict(
+        report, benchmark="backtest", csv_path=csv_path, heads=len(closed_form.rows),
+        select_s=select_seconds, report_s=time.perf_counter() - start
+    )
+
+
+def write_synthetic_sheet(path, heads, quarters=4, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=18, sigma=1, size=(heads, quarters)).round(1)
+    df = pd.DataFrame(values, columns=[f"Q{i}" for i in range(1, quarters + 1)])
+    df.insert(0, MODEL_CONFIG["topic_column"], synthetic_names(heads, seed))
+    df["Sum Value"] = values.sum(axis=1)
+    df.to_csv(path, index=False)
+    return path
+
+
+def question_corpus(names, per_branch=20, quarters=4, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for branch, template in QUESTION_TEMPLATES.items():
+        for _ in range(per_branch):
+            a, b = rng.sample(range(1, quarters + 1), 2)
+            name, other = rng.choice(names), rng.choice(names)
+            corpus.append((branch, template.format(name=name, other=other, a=a, b=b)))
+    rng.shuffle(corpus)
+    return corpus
+
+
+SUITE_PROBE = """
+import json, resource, sys, time
+import numpy as np
+from config import MODEL_CONFIG
+csv_path, qa_mode, corpus_path, train_sample = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+# No on-disk caches and no answer cache: every run measures cold work.
+MODEL_CONFIG.update(
+    qa_mode=qa_mode, data_cache_dir=None, forecast_cache_dir=None,
+    retrieval_cache_dir=None, warm_up_topics=[], answer_cache_size=0
+)
+from loader import load_csv
+from ml_predictor import train_all_models_and_rank
+from qa_pipeline import FinancialQASystem
+
+result = {}
+start = time.perf_counter()
+df = load_csv(csv_path, lowercase_columns=True)
+result["load_csv_s"] = time.perf_counter() - start
+
+start = time.perf_counter()
+train_all_models_and_rank(df.head(train_sample), MODEL_CONFIG["topic_column"])
+result["train_all_models_and_rank_s"] = time.perf_counter() - start
+result["train_sample"] = min(train_sample, len(df))
+
+start = time.perf_counter()
+qa = FinancialQASystem(csv_path=csv_path)
+result["init_s"] = time.perf_counter() - start
+
+start = time.perf_counter()
+try:
+    qa._load_model()
+    result["load_model_s"] = time.perf_counter() - start
+except Exception as e:
+    result["load_model_error"] = repr(e)
+
+corpus = json.load(open(corpus_path))
+latencies = {}
+for branch, question in corpus:
+    start = time.perf_counter()
+    qa.answer_query(question)
+    latencies.setdefault(branch, []).append(time.perf_counter() - start)
+
+def summary(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+result["answer_query"] = summary([s for seconds in latencies.values() for s in seconds])
+result["branches"] = {branch: summary(seconds) for branch, seconds in sorted(latencies.items())}
+
+start = time.perf_counter()
+list(qa.answer_many(question for _, question in corpus))
+result["answer_many_qps"] = len(corpus) / (time.perf_counter() - start)
+result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+
+def _git_commit(cwd):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cwd, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(sizes=(10, 1000, 100000, 1000000), per_branch=20, qa_mode="rules", train_sample=20, seed=0):
+    # Each sheet size runs in a fresh interpreter so timings and peak RSS
+    # are not polluted by earlier sizes.
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for heads in sizes:
+            csv_path = write_synthetic_sheet(os.path.join(tmp, f"heads_{heads}.csv"), heads, seed=seed)
+            names = synthetic_names(heads, seed)
+            corpus_path = os.path.join(tmp, f"corpus_{heads}.json")
+            with open(corpus_path, "w") as f:
+                json.dump(question_corpus(names, per_branch, seed=seed), f)
+
+            out = subprocess.run(
+                [sys.executable, "-c", SUITE_PROBE, csv_path, qa_mode, corpus_path, str(train_sample)],
+                cwd=cwd, capture_output=True, text=True, check=True
+            ).stdout
+            results[str(heads)] = json.loads(out.strip().splitlines()[-1])
+    return {
+        "benchmark": "suite",
+        "commit": _git_commit(cwd),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "qa_mode": qa_mode,
+        "questions_per_branch": per_branch,
+        "results": results,
+    }
+
+
+def _flatten(result, prefix=""):
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline, current, threshold=0.1):
+    # Ratios of every numeric metric; throughput regresses when it drops,
+    # everything else (time, memory) when it grows.
+    old, new = _flatten(baseline["results"]), _flatten(current["results"])
+    rows = {}
+    for metric in sorted(old.keys() & new.keys()):
+        if not old[metric]:
+            continue
+        ratio = new[metric] / old[metric]
+        worse = ratio < 1 - threshold if metric.endswith("_qps") else ratio > 1 + threshold
+        rows[metric] = {"baseline": old[metric], "current": new[metric], "ratio": ratio, "regression": worse}
+    return {
+        "baseline_commit": baseline.get("commit"),
+        "current_commit": current.get("commit"),
+        "regressions": [metric for metric, row in rows.items() if row["regression"]],
+        "metrics": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the Q&A pipeline.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    fuzzy = subparsers.add_parser("fuzzy", help="fuzzy topic resolution: FuzzyTopicIndex vs process.extractOne")
+    fuzzy.add_argument("--topics", type=int, default=1000)
+    fuzzy.add_argument("--queries", type=int, default=50)
+    fuzzy.add_argument("--seed", type=int, default=0)
+
+    startup = subparsers.add_parser("startup", help="import/init time and peak RSS, with and without the QA model")
+    startup.add_argument("--csv", default=None)
+
+    backtest = subparsers.add_parser("backtest", help="walk-forward forecast model selection and per-model errors")
+    backtest.add_argument("--csv", default=None)
+    backtest.add_argument("--fitted-forests", action="store_true", help="score real Random Forests instead of their expected forecast")
+    backtest.add_argument("--workers", type=int, default=None, help="processes fitting forests")
+
+    suite = subparsers.add_parser("suite", help="startup, answer_query latency, throughput and memory on synthetic sheets")
+    suite.add_argument("--sizes", default="10,1000,100000,1000000", help="comma-separated business head counts")
+    suite.add_argument("--per-branch", type=int, default=20, help="questions per handle_complex_query branch")
+    suite.add_argument("--qa-mode", choices=["rules", "full"], default="rules")
+    suite.add_argument("--train-sample", type=int, default=20, help="heads passed to train_all_models_and_rank")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", help="also write the JSON result to this file")
+
+    diff = subparsers.add_parser("compare", help="compare two saved suite results")
+    diff.add_argument("baseline")
+    diff.add_argument("current")
+    diff.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+
+    args = parser.parse_args()
+    if args.benchmark == "fuzzy":
+        result = bench_fuzzy(args.topics, args.queries, args.seed)
+    elif args.benchmark == "startup":
+        result = bench_startup(args.csv)
+    elif args.benchmark == "backtest":
+        result = bench_backtest(args.csv, args.fitted_forests, args.workers)
+    elif args.benchmark == "suite":
+        sizes = [int(size) for size in args.sizes.split(",")]
+        result = bench_suite(sizes, args.per_branch, args.qa_mode, args.train_sample, args.seed)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+    elif args.benchmark == "compare":
+        with open(args.baseline) as f, open(args.current) as g:
+            result = compare(json.load(f), json.load(g), args.threshold)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,50 @@
-TOPIC_ALIASES = {
-    "ashish": "ashish",
-    "faizan": "faizan ali khan",
-    "gaurav": "gaurav dharane",
-    "kaustubh": "kaustubh a.varde",
-    "nitesh": "nitesh jain",
-    "prem": "prem prabhanshu",
-    "robin": "robin gupta",
-    "sanjeev": "sanjeev patni",
-    "shariq": "shariq imam",
-    "suhail": "suhail",
-    "udit": "udit agrawal"
-}
-
-QUARTER_MAPPING = {
-    "q1": "q1", "first quarter": "q1", "jan-mar": "q1", "first": "q1",
-    "q2": "q2", "second quarter": "q2", "apr-jun": "q2", "second": "q2",
-    "q3": "q3", "third quarter": "q3", "jul-sep": "q3", "third": "q3",
-    "q4": "q4", "fourth quarter": "q4", "oct-dec": "q4", "last quarter": "q4", "last": "q4",
-    "current quarter": "q3",
-    "next quarter": "q5", "next year": "q5", "next year q1": "q5",
-    "future": "q5", "q5": "q5",
-    "full year": "sum value", "total": "sum value"
-}
-
-MODEL_CONFIG = {
-    "model_path": "qa_finetuned",
-    "csv_path": "Business Heads.csv",
-    "topic_column": "Business Head"
-}
+TOPIC_ALIASES = {
+    "ashish": "ashish",
+    "faizan": "faizan ali khan",
+    "gaurav": "gaurav dharane",
+    "kaustubh": "kaustubh a.varde",
+    "nitesh": "nitesh jain",
+    "prem": "prem prabhanshu",
+    "robin": "robin gupta",
+    "sanjeev": "sanjeev patni",
+    "shariq": "shariq imam",
+    "suhail": "suhail",
+    "udit": "udit agrawal"
+}
+
+QUARTER_MAPPING = {
+    "q1": "q1", "first quarter": "q1", "jan-mar": "q1", "first": "q1",
+    "q2": "q2", "second quarter": "q2", "apr-jun": "q2", "second": "q2",
+    "q3": "q3", "third quarter": "q3", "jul-sep": "q3", "third": "q3",
+    "q4": "q4", "fourth quarter": "q4", "oct-dec": "q4", "last quarter": "q4", "last": "q4",
+    "current quarter": "q3",
+    "next quarter": "q5", "next year": "q5", "next year q1": "q5",
+    "future": "q5", "q5": "q5",
+    "full year": "sum value", "total": "sum value"
+}
+
+MODEL_CONFIG = {
+    "model_path": "qa_finetuned",
+    "csv_path": "Business Heads.csv",
+    "topic_column": "Business Head",
+    "csv_chunksize": 100000,
+    "quarter_dtype": "float64",
+    "data_cache_dir": ".data_cache",
+    "forecast_horizon": 20,
+    "forecast_dtype": "float32",
+    "forecast_cache_dir": ".forecast_cache",
+    "forecast_table_mmap": True,
+    "cache_keep_versions": 2,
+    "warm_up_topics": [],
+    "answer_cache_size": 1024,
+    "answer_cache_ttl": 3600,
+    "csv_reload_interval": 5,
+    "qa_mode": "full",
+    "qa_quantize": True,
+    "qa_batch_size": 16,
+    "retrieval_model": "sentence-transformers/all-MiniLM-L6-v2",
+    "retrieval_top_k": 3,
+    "retrieval_cache_dir": ".retrieval_cache",
+    "stage_timing": True,
+    "profiler_interval": None
+}
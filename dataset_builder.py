@@ -1,106 +1,191 @@
-import pandas as pd
-import json
-from config import MODEL_CONFIG
-
-
-def load_csv(file_path=None):
-    file_path = file_path or MODEL_CONFIG["csv_path"]
-    df = pd.read_csv(file_path)
-    topic_col = MODEL_CONFIG["topic_column"]
-    df[topic_col] = df[topic_col].astype(str).str.strip().str.lower()
-    return df
-
-
-def generate_basic_examples(df, topic_col):
-    examples = []
-    for _, row in df.iterrows():
-        topic = row[topic_col]
-        for col in df.columns:
-            if col.lower().startswith("q") and pd.notna(row[col]):
-                question = f"What is the value of {topic} in {col.upper()}?"
-                context = f"The value of {topic} in {col.upper()} is {row[col]}."
-                answer_text = str(row[col])
-                start = context.find(answer_text)
-                if start != -1:
-                    examples.append({
-                        "context": context,
-                        "question": question,
-                        "answers": [{"text": answer_text, "answer_start": start}]
-                    })
-    return examples
-
-
-def generate_comparison_examples(df, topic_col):
-    examples = []
-    for _, row in df.iterrows():
-        topic = row[topic_col]
-        values = {col.lower(): row[col] for col in df.columns if col.lower().startswith("q")}
-        qtrs = list(values.keys())
-        for i in range(len(qtrs) - 1):
-            q1, q2 = qtrs[i], qtrs[i + 1]
-            val1, val2 = values[q1], values[q2]
-            if pd.notna(val1) and pd.notna(val2):
-                try:
-                    val1 = float(str(val1).replace(",", ""))
-                    val2 = float(str(val2).replace(",", ""))
-                    change = (val2 - val1) / val1 * 100
-                    label = "yes" if val2 > val1 else "no"
-                    pct = f"{abs(change):.2f}%"
-
-                    context = (
-                        f"The {topic} {'increased' if val2 > val1 else 'decreased'} "
-                        f"from {val1} in {q1.upper()} to {val2} in {q2.upper()} ({pct}). The answer is {label}."
-                    )
-
-                    start = context.find(label)
-                    if start != -1:
-                        examples.append({
-                            "context": context,
-                            "question": f"Did {topic} increase from {q1.upper()} to {q2.upper()}?",
-                            "answers": [{"text": label, "answer_start": start}]
-                        })
-
-                    start_pct = context.find(pct)
-                    if start_pct != -1:
-                        examples.append({
-                            "context": context,
-                            "question": f"What was the percentage change in {topic} from {q1.upper()} to {q2.upper()}?",
-                            "answers": [{"text": pct, "answer_start": start_pct}]
-                        })
-
-                except:
-                    continue
-    return examples
-
-
-def build_dataset():
-    df = load_csv()
-    topic_col = MODEL_CONFIG["topic_column"]
-    basic_examples = generate_basic_examples(df, topic_col)
-    comparison_examples = generate_comparison_examples(df, topic_col)
-    all_examples = basic_examples + comparison_examples
-
-    squad_data = {
-        "data": [{
-            "title": "financial_dataset",
-            "paragraphs": [
-                {
-                    "context": ex["context"],
-                    "qas": [{
-                        "id": f"q_{i}",
-                        "question": ex["question"],
-                        "answers": ex["answers"],
-                        "is_impossible": False
-                    }]
-                }
-                for i, ex in enumerate(all_examples)
-            ]
-        }]
-    }
-
-    with open("squad.json", "w") as f:
-        json.dump(squad_data, f, indent=2)
-
-
-if __name__ == "__main__":
-    build_dataset()
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from config import MODEL_CONFIG
+import loader
+
+
+def load_csv(file_path=None):
+    return loader.load_csv(file_path or MODEL_CONFIG["csv_path"])
+
+
+def _quarter_columns(df):
+    return [col for col in df.columns if col.lower().startswith("q")]
+
+
+def _as_text(values):
+    # str() of every cell, as the old per-cell f-strings produced.
+    return pd.Series(values, dtype=object).map(str).to_numpy(dtype=object)
+
+
+def _find(contexts, answers):
+    return np.char.find(contexts.astype(str), answers.astype(str))
+
+
+def basic_example_frame(df, topic_col):
+    # One row per non-empty (topic, quarter) cell, in row-major order.
+    columns = _quarter_columns(df)
+    values = df[columns].to_numpy(dtype=object)
+    rows, cols = np.nonzero(pd.notna(values))
+    topics = _as_text(df[topic_col].to_numpy(dtype=object)[rows])
+    labels = np.array([col.upper() for col in columns], dtype=object)[cols]
+    answers = _as_text(values[rows, cols])
+
+    contexts = "The value of " + topics + " in " + labels + " is " + answers + "."
+    frame = pd.DataFrame({
+        "context": contexts,
+        "question": "What is the value of " + topics + " in " + labels + "?",
+        "text": answers,
+        "answer_start": _find(contexts, answers),
+    })
+    return frame[frame["answer_start"] != -1].reset_index(drop=True)
+
+
+def _numeric(df, columns):
+    # Text cells like "1,200" are parsed; anything unparsable becomes NaN.
+    return np.column_stack([
+        df[col].to_numpy(dtype=np.float64, na_value=np.nan) if pd.api.types.is_numeric_dtype(df[col])
+        else pd.to_numeric(df[col].astype(str).str.replace(",", ""), errors="coerce").to_numpy(dtype=np.float64)
+        for col in columns
+    ]) if columns else np.empty((len(df), 0))
+
+
+def comparison_example_frame(df, topic_col):
+    # A yes/no and a percentage-change example per consecutive quarter pair,
+    # interleaved per pair as before. Pairs with a missing, unparsable or
+    # zero first value are skipped.
+    columns = _quarter_columns(df)
+    values = _numeric(df, columns)
+    before, after = values[:, :-1], values[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (after - before) / before * 100
+    rows, pairs = np.nonzero(~np.isnan(before) & ~np.isnan(after) & (before != 0))
+    if not len(rows):
+        return pd.DataFrame(columns=["context", "question", "text", "answer_start"])
+
+    topics = _as_text(df[topic_col].to_numpy(dtype=object)[rows])
+    labels = np.array([col.upper() for col in columns], dtype=object)
+    q1, q2 = labels[pairs], labels[pairs + 1]
+    val1, val2 = before[rows, pairs], after[rows, pairs]
+    increased = val2 > val1
+    label = np.where(increased, "yes", "no").astype(object)
+    pct = pd.Series(np.abs(change[rows, pairs])).map("{:.2f}%".format).to_numpy(dtype=object)
+
+    contexts = (
+        "The " + topics + " " + np.where(increased, "increased", "decreased").astype(object)
+        + " from " + _as_text(val1) + " in " + q1 + " to " + _as_text(val2) + " in " + q2
+        + " (" + pct + "). The answer is " + label + "."
+    )
+    yes_no = pd.DataFrame({
+        "context": contexts,
+        "question": "Did " + topics + " increase from " + q1 + " to " + q2 + "?",
+        "text": label,
+        "answer_start": _find(contexts, label),
+    })
+    percentage = pd.DataFrame({
+        "context": contexts,
+        "question": "What was the percentage change in " + topics + " from " + q1 + " to " + q2 + "?",
+        "text": pct,
+        "answer_start": _find(contexts, pct),
+    })
+    frame = pd.concat([yes_no, percentage]).sort_index(kind="stable")
+    return frame[frame["answer_start"] != -1].reset_index(drop=True)
+
+
+def _records(frame):
+    return [
+        {"context": context, "question": question, "answers": [{"text": text, "answer_start": int(start)}]}
+        for context, question, text, start in frame.itertuples(index=False)
+    ]
+
+
+def generate_basic_examples(df, topic_col):
+    return _records(basic_example_frame(df, topic_col))
+
+
+def generate_comparison_examples(df, topic_col):
+    return _records(comparison_example_frame(df, topic_col))
+
+
+GENERATORS = {"basic": basic_example_frame, "comparison": comparison_example_frame}
+
+
+def _generate(kind, shard, topic_col):
+    return GENERATORS[kind](shard, topic_col)
+
+
+# Characters json.dumps would escape; rows containing any are serialized by
+# json.dumps, all others by plain string concatenation.
+NEEDS_ESCAPE = r'["\\\x00-\x1f]|[^\x00-\x7f]'
+
+
+def json_lines(frame, first_id=0):
+    # SQuAD-style JSON lines (the Hugging Face "squad" layout), byte-for-byte
+    # what json.dumps would produce.
+    ids = pd.Series(np.arange(first_id, first_id + len(frame)), index=frame.index).astype(str)
+    lines = (
+        '{"id": "q_' + ids + '", "context": "' + frame["context"] + '", "question": "' + frame["question"]
+        + '", "answers": {"text": ["' + frame["text"] + '"], "answer_start": ['
+        + frame["answer_start"].astype(str) + "]}}"
+    ).tolist()
+    # The answer text is part of the context, so it needs no separate check.
+    escape = (frame["context"] + frame["question"]).str.contains(NEEDS_ESCAPE).to_numpy()
+    for i in np.flatnonzero(escape):
+        context, question, text, start = frame.iloc[i]
+        lines[i] = json.dumps({
+            "id": f"q_{first_id + i}",
+            "context": context,
+            "question": question,
+            "answers": {"text": [text], "answer_start": [int(start)]},
+        })
+    return lines
+
+
+def build_dataset(csv_path=None, output="squad.jsonl", workers=1, shard_rows=10000):
+    # Streams JSON lines one row shard at a time, so memory stays bounded by
+    # the shard size. With workers > 1 the shards are generated in parallel
+    # but written in order.
+    df = load_csv(csv_path)
+    topic_col = MODEL_CONFIG["topic_column"]
+    jobs = [
+        (kind, df.iloc[start:start + shard_rows])
+        for kind in GENERATORS for start in range(0, len(df), shard_rows)
+    ]
+
+    start_time = time.perf_counter()
+    count = 0
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            frames = executor.map(_generate, *zip(*jobs), [topic_col] * len(jobs))
+        else:
+            executor = None
+            frames = (_generate(kind, shard, topic_col) for kind, shard in jobs)
+        try:
+            for frame in frames:
+                if len(frame):
+                    f.write("\n".join(json_lines(frame, count)) + "\n")
+                    count += len(frame)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+    os.replace(tmp_path, output)
+
+    seconds = time.perf_counter() - start_time
+    print(f"✅ Wrote {count} examples to {output} in {seconds:.2f}s")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate SQuAD-style QA training data from the CSV.")
+    parser.add_argument("--csv", default=None)
+    parser.add_argument("--output", default="squad.jsonl")
+    parser.add_argument("--workers", type=int, default=1, help="generate row shards in this many processes")
+    parser.add_argument("--shard-rows", type=int, default=10000)
+    args = parser.parse_args()
+    build_dataset(args.csv, args.output, args.workers, args.shard_rows)
@@ -0,0 +1,85 @@
+from functools import lru_cache
+
+import numpy as np
+import torch
+from transformers import AutoModelForQuestionAnswering, AutoTokenizer
+
+
+class ExtractiveQA:
+    # Batched span extraction over short per-topic contexts. Contexts are
+    # tokenized once and cached, questions are tokenized per batch, and each
+    # batch is padded only to its longest sequence. On CPU the Linear layers
+    # are dynamically quantized to int8.
+    def __init__(self, model_path, quantize=True, batch_size=16, max_length=384,
+                 max_answer_tokens=30, cache_size=1024):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForQuestionAnswering.from_pretrained(model_path).eval()
+        self.quantized = quantize and not torch.cuda.is_available()
+        if self.quantized:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.max_answer_tokens = max_answer_tokens
+        self._uses_token_types = "token_type_ids" in self.tokenizer.model_input_names
+        self.encode_context = lru_cache(maxsize=cache_size)(self._encode_context)
+
+    def _encode_context(self, context):
+        encoded = self.tokenizer(context, add_special_tokens=False, return_offsets_mapping=True)
+        return encoded["input_ids"], encoded["offset_mapping"]
+
+    def answer(self, questions, contexts):
+        results = []
+        for start in range(0, len(questions), self.batch_size):
+            results.extend(self._answer_batch(
+                questions[start:start + self.batch_size], contexts[start:start + self.batch_size]
+            ))
+        return results
+
+    def _answer_batch(self, questions, contexts):
+        cls_id, sep_id = self.tokenizer.cls_token_id, self.tokenizer.sep_token_id
+        question_ids = self.tokenizer(list(questions), add_special_tokens=False)["input_ids"]
+
+        rows = []
+        for q_ids, context in zip(question_ids, contexts):
+            c_ids, offsets = self.encode_context(context)
+            room = max(self.max_length - len(q_ids) - 3, 0)
+            c_ids, offsets = c_ids[:room], offsets[:room]
+            context_start = len(q_ids) + 2
+            rows.append(([cls_id] + q_ids + [sep_id] + c_ids + [sep_id], context_start, offsets))
+
+        width = max(len(ids) for ids, _, _ in rows)
+        input_ids = np.full((len(rows), width), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+        token_type_ids = np.zeros((len(rows), width), dtype=np.int64)
+        context_mask = np.zeros((len(rows), width), dtype=bool)
+        for i, (ids, context_start, offsets) in enumerate(rows):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+            token_type_ids[i, context_start:len(ids)] = 1
+            context_mask[i, context_start:context_start + len(offsets)] = True
+
+        inputs = {"input_ids": torch.from_numpy(input_ids), "attention_mask": torch.from_numpy(attention_mask)}
+        if self._uses_token_types:
+            inputs["token_type_ids"] = torch.from_numpy(token_type_ids)
+        with torch.inference_mode():
+            outputs = self.model(**inputs)
+        start_logits = outputs.start_logits.float().numpy()
+        end_logits = outputs.end_logits.float().numpy()
+
+        start_logits = np.where(context_mask, start_logits, -np.inf)
+        end_logits = np.where(context_mask, end_logits, -np.inf)
+        # Valid spans have start <= end < start + max_answer_tokens.
+        span = np.triu(np.ones((width, width), dtype=bool)) & ~np.triu(np.ones((width, width), dtype=bool), self.max_answer_tokens)
+        scores = np.where(span, start_logits[:, :, None] + end_logits[:, None, :], -np.inf)
+
+        answers = []
+        for i, ((_, context_start, offsets), context) in enumerate(zip(rows, contexts)):
+            if not offsets:
+                answers.append(None)
+                continue
+            best = int(np.argmax(scores[i]))
+            s, e = divmod(best, width)
+            text = context[offsets[s - context_start][0]:offsets[e - context_start][1]].strip()
+            answers.append((text, float(scores[i].flat[best])) if text else None)
+        return answers
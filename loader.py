@@ -1,18 +1,167 @@
-import pandas as pd
-from config import MODEL_CONFIG 
-
-def load_csv(file_path):
-    df = pd.read_csv(file_path)
-    df.columns = [col.strip() for col in df.columns]  
-
-    topic_col = MODEL_CONFIG.get("topic_column", "Business Head")
-    if topic_col in df.columns:
-        df[topic_col] = df[topic_col].astype(str).str.strip().str.lower()
-    else:
-        raise KeyError(f"❌ Column '{topic_col}' not found in CSV. Available columns: {df.columns.tolist()}")
-
-    return df
-
-def chunk_csv_as_text(df, chunk_size=800):
-    text = df.to_string(index=False)
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+import hashlib
+import os
+import re
+import shutil
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from config import MODEL_CONFIG 
+
+QUARTER_PATTERN = re.compile(r"^q(\d+)$")
+YEAR_QUARTER_PATTERNS = [
+    re.compile(r"^(?:fy)?'?(?P<year>\d{2}|\d{4})[\s\-_/]*q(?P<q>[1-4])$"),
+    re.compile(r"^q(?P<q>[1-4])[\s\-_/]*(?:fy)?'?(?P<year>\d{2}|\d{4})$"),
+]
+
+def year_quarter(name):
+    # (year, quarter) of a year-quarter column name like "2023 Q1", "Q1-24"
+    # or "FY23 Q4"; None for anything else.
+    name = str(name).strip().lower()
+    for pattern in YEAR_QUARTER_PATTERNS:
+        match = pattern.match(name)
+        if match:
+            year = int(match.group("year"))
+            return (year + 2000 if year < 100 else year, int(match.group("q")))
+    return None
+
+def quarter_columns(columns):
+    # Returns (column, quarter number) in chronological order. Plain "Qn"
+    # columns keep n; year-quarter columns ("2023 Q1", "Q1-24", "FY23 Q4")
+    # are numbered 1..N in date order.
+    plain, dated = [], []
+    for col in columns:
+        match = QUARTER_PATTERN.match(str(col).strip().lower())
+        if match:
+            plain.append((int(match.group(1)), col))
+            continue
+        dated_quarter = year_quarter(col)
+        if dated_quarter:
+            dated.append((dated_quarter, col))
+
+    if dated:
+        return [(col, i + 1) for i, (_, col) in enumerate(sorted(dated))]
+    return [(col, n) for n, col in sorted(plain)]
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def touch(path):
+    # Marks a cache entry as recently used, so prune_cache keeps it.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def prune_cache(cache_dir, pattern, keep):
+    # Deletes all but the `keep` most recently used entries of cache_dir
+    # whose names fully match pattern; entries may be files or directories.
+    # Each new CSV version writes a new entry, so without this every save
+    # of the sheet would leave another full copy on disk.
+    if not keep or not os.path.isdir(cache_dir):
+        return
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if re.fullmatch(pattern, entry.name):
+            try:
+                entries.append((entry.stat().st_mtime_ns, entry.path, entry.is_dir()))
+            except OSError:
+                pass
+    entries.sort(reverse=True)
+    for _, path, is_dir in entries[keep:]:
+        try:
+            if is_dir:
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _read_chunks(file_path, topic_col, raw_columns, chunksize, numeric_dtype, lowercase_columns):
+    dtype = {raw: str for raw in raw_columns if raw.strip() == topic_col}
+    if numeric_dtype:
+        dtype.update({raw: numeric_dtype for raw in raw_columns if raw.strip() != topic_col})
+
+    parts = []
+    for chunk in pd.read_csv(file_path, dtype=dtype, chunksize=chunksize):
+        chunk.columns = [col.strip() for col in chunk.columns]
+        # Topic names are normalized once, chunk by chunk, and kept categorical.
+        chunk[topic_col] = chunk[topic_col].str.strip().str.lower().astype("category")
+        if lowercase_columns:
+            chunk.columns = [col.lower() for col in chunk.columns]
+        parts.append(chunk)
+    return parts
+
+def _stat(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def load_csv(file_path, lowercase_columns=False, chunksize=None, cache_dir=None, return_digest=False, retries=3):
+    # With return_digest, returns (df, digest) so the caller can key its own
+    # caches by the same hash instead of reading the file again.
+    topic_col = MODEL_CONFIG.get("topic_column", "Business Head")
+    chunksize = chunksize or MODEL_CONFIG.get("csv_chunksize", 100_000)
+    quarter_dtype = MODEL_CONFIG.get("quarter_dtype", "float64")
+
+    digest = None
+    if cache_dir or return_digest:
+        # Hashed once, before the read; a file that changes while it is read
+        # is read again, so the digest always matches the returned data.
+        stat = _stat(file_path)
+        digest = file_digest(file_path)
+
+    raw_columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+    columns = [col.strip() for col in raw_columns]
+    if topic_col not in columns:
+        raise KeyError(f"❌ Column '{topic_col}' not found in CSV. Available columns: {columns}")
+
+    cache_path = None
+    if cache_dir:
+        key = hashlib.sha256(f"{digest}:{topic_col}:{quarter_dtype}:{lowercase_columns}".encode()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f"{key}.parquet")
+        if os.path.exists(cache_path):
+            try:
+                df = pd.read_parquet(cache_path, memory_map=True)
+                touch(cache_path)
+                return (df, digest) if return_digest else df
+            except (ImportError, OSError, ValueError):
+                cache_path = None
+
+    try:
+        parts = _read_chunks(file_path, topic_col, raw_columns, chunksize, quarter_dtype, lowercase_columns)
+    except ValueError:
+        # Some non-topic column is not numeric; let pandas infer those.
+        parts = _read_chunks(file_path, topic_col, raw_columns, chunksize, None, lowercase_columns)
+
+    topic_key = topic_col.lower() if lowercase_columns else topic_col
+    topics = union_categoricals([part[topic_key] for part in parts])
+    df = pd.concat([part.drop(columns=topic_key) for part in parts], ignore_index=True)
+    df.insert(columns.index(topic_col), topic_key, topics)
+
+    if digest and retries and _stat(file_path) != stat:
+        return load_csv(file_path, lowercase_columns, chunksize, cache_dir, return_digest, retries - 1)
+
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            df.to_parquet(f"{cache_path}.tmp", index=False)
+            os.replace(f"{cache_path}.tmp", cache_path)
+            prune_cache(cache_dir, r"[0-9a-f]{16}\.parquet", MODEL_CONFIG.get("cache_keep_versions", 2))
+        except (ImportError, OSError, ValueError):
+            pass
+
+    return (df, digest) if return_digest else df
+
+def chunk_csv_as_text(df, chunk_size=800):
+    text = df.to_string(index=False)
+    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+
+def topic_context(topic, values):
+    # Same sentence shape as the generated training data in dataset_builder.
+    return " ".join(
+        f"The value of {topic} in {col.upper()} is {value}."
+        for col, value in values.items() if pd.notna(value)
+    )
@@ -1,13 +1,138 @@
-from qa_pipeline import FinancialQASystem
-
-def main():
-    qa = FinancialQASystem()
-    print("CSV Q&A System — type 'exit' to quit.")
-    while True:
-        q = input("❓ Your question: ").strip()
-        if q.lower() in {"exit", "quit"}:
-            break
-        print("🧠", qa.answer_query(q))
-
-if __name__ == "__main__":
-    main()
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from qa_pipeline import FinancialQASystem
+
+# The system answering in pool workers, inherited from the parent on fork.
+_worker_qa = None
+
+
+def _record(question, answer, topic, quarter, latency, error=None):
+    record = {"question": question, "topic": topic, "quarter": quarter, "answer": answer, "latency_ms": latency * 1000}
+    if error:
+        record["error"] = error
+    return record
+
+
+def answer_chunk(qa, questions):
+    # One answer_many batch; latency_ms is the batch time per question. If
+    # the batch raises, its questions are answered one at a time so the
+    # error lands on the question that caused it.
+    start = time.perf_counter()
+    try:
+        results = list(qa.answer_many(questions, batch_size=len(questions), with_parse=True))
+    except Exception:
+        records = []
+        for question in questions:
+            start = time.perf_counter()
+            try:
+                (answer, topic, quarter), = qa.answer_many([question], with_parse=True)
+                records.append(_record(question, answer, topic, quarter, time.perf_counter() - start))
+            except Exception as e:
+                records.append(_record(question, None, None, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+        return records
+    latency = (time.perf_counter() - start) / len(questions)
+    return [_record(question, *result, latency) for question, result in zip(questions, results)]
+
+
+def _answer_chunk_in_worker(questions):
+    return answer_chunk(_worker_qa, questions)
+
+
+def _chunks(questions, size):
+    questions = iter(questions)
+    while True:
+        chunk = list(islice(questions, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def answer_stream(qa, questions, workers=1, chunk_size=64):
+    # Yields records in input order, answering chunk_size questions per
+    # answer_many call. With workers > 1 the chunks are answered in forked
+    # processes, each inheriting qa, with at most a few chunks per worker
+    # in flight so any number of questions streams in bounded memory.
+    chunks = _chunks(questions, chunk_size)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for chunk in chunks:
+            yield from answer_chunk(qa, chunk)
+        return
+
+    # Forking with the CSV watcher running could copy its lock mid-reload.
+    global _worker_qa
+    _worker_qa = qa
+    qa.stop_watching()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_answer_chunk_in_worker, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        for future in pending:
+            yield from future.result()
+
+
+def run_batch(qa, source, output, workers=1):
+    questions = (line.strip() for line in source)
+    latencies = []
+    start = time.perf_counter()
+    for record in answer_stream(qa, (q for q in questions if q), workers):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        latencies.append(record["latency_ms"])
+    seconds = time.perf_counter() - start
+    output.flush()
+
+    summary = {"questions": len(latencies), "seconds": seconds, "throughput_qps": len(latencies) / seconds if seconds else 0.0}
+    if latencies:
+        summary.update(latency_p50_ms=float(np.percentile(latencies, 50)), latency_p99_ms=float(np.percentile(latencies, 99)))
+    return summary
+
+
+def interactive(qa):
+    print("CSV Q&A System — type 'exit' to quit.")
+    while True:
+        try:
+            q = input("❓ Your question: ").strip()
+        except EOFError:
+            break
+        if q.lower() in {"exit", "quit"}:
+            break
+        print("🧠", qa.answer_query(q))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV Q&A System.")
+    parser.add_argument("--batch", metavar="FILE", help="answer one question per line from FILE ('-' for stdin) as JSON lines")
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    parser.add_argument("--workers", type=int, default=1, help="processes answering chunks of questions (Unix)")
+    args = parser.parse_args()
+
+    qa = FinancialQASystem()
+    if args.batch is None:
+        qa.watch_csv()
+        interactive(qa)
+        return
+
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        summary = run_batch(qa, source, output, args.workers)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from fuzzywuzzy import process, utils
+
+
+def _trie_pattern(terms):
+    # Literal alternation folded into a prefix trie so the regex engine
+    # follows one branch per character instead of trying every term at every
+    # position. Greedy optional groups make the longest term win.
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+# Year-quarter phrases in a lowercased question: "2024 q1", "fy24 q1",
+# "'24 q1", "q1 2024", "q1 of 2024", "q1-24", "q1 fy24". Two-digit years
+# need a "fy", "'" or "-" so "top 10 q3" is not read as a year.
+YEAR_FIRST_PATTERN = re.compile(r"\b(?:fy\s*'?(\d{4}|\d{2})|'(\d{2})|(\d{4}))[\s\-_/]*q([1-4])\b")
+QUARTER_FIRST_PATTERN = re.compile(
+    r"\bq([1-4])(?:\s+of)?(?:\s*fy\s*'?(\d{4}|\d{2})|\s*'(\d{2})|-(\d{2})|[\s\-_/]*(\d{4}))\b"
+)
+
+
+def year_quarter_mentions(text):
+    # (start, end, year, quarter) of every year-quarter phrase, in order.
+    mentions = []
+    for match in YEAR_FIRST_PATTERN.finditer(text):
+        year = next(g for g in match.groups()[:3] if g)
+        mentions.append((match.start(), match.end(), year, match.group(4)))
+    for match in QUARTER_FIRST_PATTERN.finditer(text):
+        year = next(g for g in match.groups()[1:] if g)
+        mentions.append((match.start(), match.end(), year, match.group(1)))
+
+    result, end = [], -1
+    for start, stop, year, quarter in sorted(mentions):
+        if start >= end:
+            year = int(year)
+            result.append((start, stop, year + 2000 if year < 100 else year, int(quarter)))
+            end = stop
+    return result
+
+
+class QuestionMatcher:
+    # One pass over a lowercased question finds every alias and quarter
+    # phrase (the longest one at each position). Ties between several
+    # matches are broken by dictionary order, as the old linear scans did.
+    # Any "q<number>" is also a quarter mention; ones not in the mapping
+    # rank after it, in question order.
+    GENERIC_QUARTER = r"q\d+"
+
+    def __init__(self, aliases, quarters, cache_size=4096):
+        self._terms = {}
+        for rank, (alias, canonical) in enumerate(aliases.items()):
+            self._terms.setdefault(alias, []).append(("topic", rank, canonical))
+        for rank, (phrase, mapped) in enumerate(quarters.items()):
+            self._terms.setdefault(phrase, []).append(("quarter", rank, mapped))
+        self._terms.pop("", None)
+
+        self._generic_rank = len(quarters)
+        alternatives = [self.GENERIC_QUARTER] + ([_trie_pattern(self._terms)] if self._terms else [])
+        self._pattern = re.compile(f"(?=({'|'.join(alternatives)}))")
+        self.scan = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan(self, text):
+        topic = None
+        quarters = []
+        for match in self._pattern.finditer(text):
+            term = match.group(1)
+            if term not in self._terms:
+                quarters.append((self._generic_rank, match.start(), term))
+                continue
+            for kind, rank, value in self._terms[term]:
+                if kind == "quarter":
+                    quarters.append((rank, match.start(), value))
+                elif topic is None or rank < topic[0]:
+                    topic = (rank, value)
+
+        seen = set()
+        unique_quarters = []
+        for _, _, value in sorted(quarters):
+            if value not in seen:
+                unique_quarters.append(value)
+                seen.add(value)
+        return (topic[1] if topic else None), tuple(unique_quarters)
+
+
+def _ngrams(text, n):
+    text = f" {text} "
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class FuzzyTopicIndex:
+    # Character n-gram postings over the topic names narrow a question down
+    # to the few topics it shares the most n-grams with; only those are
+    # scored by process.extractOne. Small sheets are scored in full.
+    def __init__(self, topics, ngram=3, max_candidates=50, score_cutoff=60, cache_size=4096):
+        self.topics = list(dict.fromkeys(t for t in topics if isinstance(t, str)))
+        self.ngram = ngram
+        self.max_candidates = max_candidates
+        self.score_cutoff = score_cutoff
+
+        self._postings = {}
+        for i, topic in enumerate(self.topics):
+            for gram in _ngrams(utils.full_process(topic), ngram):
+                self._postings.setdefault(gram, []).append(i)
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def candidates(self, question):
+        if len(self.topics) <= self.max_candidates:
+            return self.topics
+
+        counts = Counter()
+        for gram in _ngrams(utils.full_process(question), self.ngram):
+            counts.update(self._postings.get(gram, ()))
+        # Keep sheet order so ties resolve the same way as a full scan.
+        best = sorted(i for i, _ in counts.most_common(self.max_candidates))
+        return [self.topics[i] for i in best]
+
+    def _resolve(self, question):
+        choices = self.candidates(question)
+        if not choices:
+            return None
+        best_match, score = process.extractOne(question, choices)
+        return best_match.strip().lower() if score > self.score_cutoff else None
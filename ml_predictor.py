@@ -1,58 +1,542 @@
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
-
-def train_all_models_and_rank(df, topic_col="Business Head"):
-    topic_col = topic_col.lower()  
-
-    models = {}
-    best_model_map = {}
-
-    for idx, row in df.iterrows():
-        topic = str(row[topic_col]).strip().lower()
-
-        values = []
-        for q in ['q1', 'q2', 'q3', 'q4']:
-            try:
-                val = float(row[q])
-                if pd.notna(val):
-                    values.append(val)
-            except:
-                pass
-
-        if len(values) < 2:
-            continue
-
-        X = [[i + 1] for i in range(len(values))]
-        y = values
-
-        lr = LinearRegression()
-        rf = RandomForestRegressor()
-
-        lr.fit(X, y)
-        rf.fit(X, y)
-
-        y_pred_lr = lr.predict(X)
-        y_pred_rf = rf.predict(X)
-
-        mse_lr = mean_squared_error(y, y_pred_lr)
-        mse_rf = mean_squared_error(y, y_pred_rf)
-
-        avg_growth = lambda x: [y[-1] + ((y[-1] - y[0]) / (len(y) - 1)) * (x[0] - len(y))]
-
-        model_set = {
-            "linear_regression": lr,
-            "random_forest": rf,
-            "average_growth": avg_growth
-        }
-
-        best_model = min(
-            [("linear_regression", mse_lr), ("random_forest", mse_rf)],
-            key=lambda x: x[1]
-        )[0]
-
-        models[topic] = model_set
-        best_model_map[topic] = best_model
-
-    return models, best_model_map
+import hashlib
+import json
+import io
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from loader import prune_cache, quarter_columns, touch
+
+# Relative in-sample MSE under which the linear fit is treated as exact;
+# such topics keep linear regression without being backtested.
+EXACT_FIT_TOLERANCE = 1e-12
+
+# Anything that changes what gets fitted must be part of this, since it keys
+# the on-disk forecast cache. The forest is seeded so every process fits the
+# same forecast for the same values.
+MODEL_PARAMS = {
+    "version": 5,
+    "exact_fit_tolerance": EXACT_FIT_TOLERANCE,
+    "random_forest": {"n_estimators": 100, "random_state": 0},
+    "backtest": {"min_train": 2},
+}
+
+# Model names by the code stored per topic; code 0 marks a forecast table row
+# that has not been filled yet.
+MODEL_NAMES = ("", "linear_regression", "random_forest", "average_growth")
+MODEL_CODES = {name: code for code, name in enumerate(MODEL_NAMES) if name}
+# Candidates in tie-break order, simplest first.
+CANDIDATES = ("linear_regression", "average_growth", "random_forest")
+
+
+def quarter_matrix(df, columns):
+    Y = np.full((len(df), len(columns)), np.nan)
+    for j, col in enumerate(columns):
+        if col in df.columns:
+            Y[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return Y
+
+
+def fit_closed_form(Y):
+    # Least squares on x = 1..n over the non-missing values of each row, as
+    # the per-row fit always compacted missing quarters out of the series.
+    mask = ~np.isnan(Y)
+    y = np.where(mask, Y, 0.0)
+    x = np.cumsum(mask, axis=1) * mask
+    n = mask.sum(axis=1).astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sx, sy = x.sum(axis=1), y.sum(axis=1)
+        sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+
+        residuals = np.where(mask, y - (intercept[:, None] + slope[:, None] * x), 0.0)
+        mse = (residuals ** 2).sum(axis=1) / n
+        scale = (y ** 2).sum(axis=1) / n
+
+    rows = np.arange(len(Y))
+    first = Y[rows, mask.argmax(axis=1)]
+    last = Y[rows, Y.shape[1] - 1 - mask[:, ::-1].argmax(axis=1)]
+
+    valid = n >= 2
+    return {
+        "count": n,
+        "valid": valid,
+        "slope": slope,
+        "intercept": intercept,
+        "mse": mse,
+        "first": first,
+        "last": last,
+        "rf_selectable": valid & (mse > EXACT_FIT_TOLERANCE * scale),
+    }
+
+
+def trend_forecasts(fit, rows, horizon):
+    # Linear forecasts for quarters 1..horizon, one row per entry of rows.
+    x = np.arange(1, horizon + 1, dtype=np.float64)
+    return fit["intercept"][rows, None] + fit["slope"][rows, None] * x
+
+
+def average_growth_forecasts(fit, rows, horizon):
+    # The last value plus the average step per value for each quarter past
+    # the number of values.
+    x = np.arange(1, horizon + 1, dtype=np.float64)
+    count = fit["count"][rows, None]
+    step = (fit["last"][rows, None] - fit["first"][rows, None]) / (count - 1)
+    return fit["last"][rows, None] + step * (x - count)
+
+
+def fit_random_forest(values):
+    # sklearn takes seconds to import and is only needed once a forest is fitted.
+    from sklearn.ensemble import RandomForestRegressor
+
+    rf = RandomForestRegressor(**MODEL_PARAMS["random_forest"])
+    rf.fit([[i + 1] for i in range(len(values))], values)
+    return rf
+
+
+def compact_matrix(Y):
+    # Each row's non-missing values moved to the front, in order; the fits
+    # always see a topic's values as the series x = 1..n.
+    return np.take_along_axis(Y, np.argsort(np.isnan(Y), axis=1, kind="stable"), axis=1)
+
+
+def expected_forest_weights(k):
+    # A fully grown tree on one feature predicts any x past the training
+    # range with the value of the latest point in its bootstrap sample, which
+    # is point j of k with probability (j/k)^k - ((j-1)/k)^k. A forest's
+    # forecast one step ahead is therefore this weighted average, up to
+    # sampling noise.
+    j = np.arange(1, k + 1)
+    return (j / k) ** k - ((j - 1) / k) ** k
+
+
+def walk_forward_forecasts(C, min_train=2):
+    # Rolling-origin one-step-ahead forecasts: at origin k every candidate is
+    # fitted on a topic's first k values and forecasts value k + 1. Returns
+    # the actual values and {model: forecasts}, both (topics, origins) with
+    # NaN where a topic has no value k + 1.
+    origins = range(min_train, C.shape[1])
+    actual = C[:, min_train:]
+    forecasts = {name: np.full(actual.shape, np.nan) for name in CANDIDATES}
+    for j, k in enumerate(origins):
+        train = C[:, :k]
+        x = np.arange(1, k + 1, dtype=np.float64) - (k + 1) / 2
+        mean = train.mean(axis=1)
+        slope = (train * x).sum(axis=1) / (x * x).sum()
+        forecasts["linear_regression"][:, j] = mean + slope * (k + 1) / 2
+        forecasts["average_growth"][:, j] = train[:, -1] + (train[:, -1] - train[:, 0]) / (k - 1)
+        forecasts["random_forest"][:, j] = train @ expected_forest_weights(k)
+    for values in forecasts.values():
+        values[np.isnan(actual)] = np.nan
+    return actual, forecasts
+
+
+def _fitted_forest_forecasts(C, min_train):
+    out = np.full((len(C), C.shape[1] - min_train), np.nan)
+    for i, row in enumerate(C):
+        values = row[~np.isnan(row)]
+        for j, k in enumerate(range(min_train, len(values))):
+            out[i, j] = fit_random_forest(values[:k]).predict([[k + 1]])[0]
+    return out
+
+
+def fitted_forest_forecasts(C, min_train=2, workers=None, chunk_rows=64):
+    # The same walk-forward forecasts from real forests, fitted across topics
+    # in a process pool; slow, but checks the expected-forest shortcut.
+    chunks = [C[start:start + chunk_rows] for start in range(0, len(C), chunk_rows)]
+    if not chunks:
+        return np.empty((0, max(C.shape[1] - min_train, 0)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.vstack(list(executor.map(_fitted_forest_forecasts, chunks, [min_train] * len(chunks))))
+
+
+def _mean_squared_errors(forecasts, actual):
+    # Per topic over its tested origins; NaN for a topic with none.
+    squared = (forecasts - actual) ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nansum(squared, axis=1) / (~np.isnan(squared)).sum(axis=1)
+
+
+def select_models(Y, fit, min_train=2):
+    # Picks each topic's model by out-of-sample MSE of its walk-forward
+    # forecasts, ties going to the simpler model. Topics with an exact linear
+    # fit, or too few values to test, keep linear regression.
+    actual, forecasts = walk_forward_forecasts(compact_matrix(Y), min_train)
+    errors = np.stack([_mean_squared_errors(forecasts[name], actual) for name in CANDIDATES], axis=1)
+    errors = np.where(np.isnan(errors), np.inf, errors)
+    codes = np.array([MODEL_CODES[name] for name in CANDIDATES], dtype=np.uint8)
+    best = codes[errors.argmin(axis=1)]
+    best[~fit["rf_selectable"] | np.isinf(errors).all(axis=1)] = MODEL_CODES["linear_regression"]
+    return best
+
+
+def backtest_report(actual, forecasts):
+    # Per-model error distributions over every (topic, origin) forecast, and
+    # how many topics each model would win on MSE.
+    present = ~np.isnan(actual)
+    report = {"topics": int(present.any(axis=1).sum()), "forecasts": int(present.sum()), "models": {}}
+    mse = np.stack([_mean_squared_errors(forecasts[name], actual) for name in CANDIDATES], axis=1)
+    tested = ~np.isnan(mse).all(axis=1)
+    wins = np.bincount(np.where(np.isnan(mse), np.inf, mse)[tested].argmin(axis=1), minlength=len(CANDIDATES))
+    for name, won in zip(CANDIDATES, wins):
+        error = (forecasts[name] - actual)[present]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ape = np.abs(error) / np.abs(actual[present]) * 100
+        ape = ape[np.isfinite(ape)]
+        report["models"][name] = {
+            "mae": float(np.abs(error).mean()) if len(error) else None,
+            "rmse": float(np.sqrt((error ** 2).mean())) if len(error) else None,
+            "bias": float(error.mean()) if len(error) else None,
+            "ape_p50": float(np.percentile(ape, 50)) if len(ape) else None,
+            "ape_p90": float(np.percentile(ape, 90)) if len(ape) else None,
+            "wins": int(won),
+        }
+    return report
+
+
+def _topic_rows(df, topic_col, valid):
+    # Later rows win, matching the old per-row loop that overwrote topics.
+    rows = {}
+    topics = df[topic_col].astype(str).str.strip().str.lower().tolist()
+    for i, topic in enumerate(topics):
+        if valid[i]:
+            rows[topic] = i
+    return rows
+
+
+class ClosedFormModels:
+    def __init__(self, Y, fit, rows):
+        self.Y = Y
+        self.fit = fit
+        self.rows = rows
+
+    @classmethod
+    def from_frame(cls, df, topic_col="Business Head", columns=None):
+        if columns is None:
+            columns = [col for col, _ in quarter_columns(df.columns)]
+        Y = quarter_matrix(df, columns)
+        fit = fit_closed_form(Y)
+        fit["best_model"] = select_models(Y, fit, MODEL_PARAMS["backtest"]["min_train"])
+        return cls(Y, fit, _topic_rows(df, topic_col.lower(), fit["valid"]))
+
+    def values(self, topic):
+        row = self.Y[self.rows[topic]]
+        return row[~np.isnan(row)].tolist()
+
+    def best_model(self, topic):
+        return MODEL_NAMES[self.fit["best_model"][self.rows[topic]]]
+
+    def backtest(self, min_train=None, fitted_forests=False, workers=None):
+        # Walk-forward error distributions of every candidate over the topics
+        # and how many topics selected each model. fitted_forests scores real
+        # forests, fitted in a process pool, instead of the expected forecast.
+        min_train = min_train or MODEL_PARAMS["backtest"]["min_train"]
+        rows = np.fromiter(self.rows.values(), dtype=np.int64, count=len(self.rows))
+        C = compact_matrix(np.asarray(self.Y)[rows])
+        actual, forecasts = walk_forward_forecasts(C, min_train)
+        if fitted_forests:
+            forecasts["random_forest"] = fitted_forest_forecasts(C, min_train, workers)
+        report = backtest_report(actual, forecasts)
+        report["selected"] = dict(Counter(MODEL_NAMES[code] for code in self.fit["best_model"][rows]))
+        return report
+
+    def forecast_topic(self, topic, horizon):
+        # Returns the topic's selected model and its forecasts for quarters
+        # 1..horizon; a fitted forest is dropped once it has predicted them.
+        i = self.rows[topic]
+        best_model = self.best_model(topic)
+        if best_model == "random_forest":
+            forecast = fit_random_forest(self.values(topic)).predict(np.arange(1, horizon + 1).reshape(-1, 1))
+        elif best_model == "average_growth":
+            forecast = average_growth_forecasts(self.fit, [i], horizon)[0]
+        else:
+            forecast = trend_forecasts(self.fit, [i], horizon)[0]
+        return best_model, forecast
+
+
+class ForecastTable:
+    # Every topic's forecasts for quarters 1..horizon under its selected
+    # model, in one contiguous (rows x horizon) array indexed by the
+    # ClosedFormModels row of the topic.
+    def __init__(self, rows, values, models):
+        self.rows = rows
+        self.values = values
+        self.models = models
+
+    @classmethod
+    def empty(cls, rows, size, horizon, dtype="float32"):
+        return cls(rows, np.full((size, horizon), np.nan, dtype=dtype), np.zeros(size, dtype=np.uint8))
+
+    @property
+    def horizon(self):
+        return self.values.shape[1]
+
+    def __contains__(self, topic):
+        i = self.rows.get(topic)
+        return i is not None and self.models[i] != 0
+
+    def get(self, topic):
+        i = self.rows.get(topic)
+        if i is None or not self.models[i]:
+            return None
+        return self.values[i], MODEL_NAMES[self.models[i]]
+
+    def set(self, topic, best_model, forecast):
+        i = self.rows[topic]
+        self.values[i] = forecast
+        # Written last, so a reader that sees the code sees the forecasts.
+        self.models[i] = MODEL_CODES[best_model]
+
+    def fill_closed_form(self, closed_form):
+        # Rows of topics that selected a closed-form model are filled in one
+        # vectorized pass per model.
+        fit = closed_form.fit
+        rows = np.fromiter(closed_form.rows.values(), dtype=np.int64, count=len(closed_form.rows))
+        rows = rows[self.models[rows] == 0]
+        for name, forecasts in [("linear_regression", trend_forecasts), ("average_growth", average_growth_forecasts)]:
+            picked = rows[fit["best_model"][rows] == MODEL_CODES[name]]
+            if len(picked):
+                self.values[picked] = forecasts(fit, picked, self.horizon)
+                self.models[picked] = MODEL_CODES[name]
+
+    def best_models(self):
+        return {topic: MODEL_NAMES[self.models[i]] for topic, i in self.rows.items() if self.models[i]}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ForecastCache:
+    # Closed-form arrays live under a directory keyed by the CSV content and
+    # MODEL_PARAMS and are memory-mapped on load, as is the forecast table
+    # when it is persisted. Forecasts of topics that needed a forest are also
+    # stored per topic, keyed by the topic's own values, so after a CSV edit
+    # only the rows that changed get refitted. Only the `keep` most recently
+    # used entries, and that many sheets' worth of topic files, are kept.
+    ARRAYS = ("Y", "count", "valid", "slope", "intercept", "mse", "first", "last", "rf_selectable", "best_model")
+
+    def __init__(self, cache_dir, csv_digest, params=MODEL_PARAMS, keep=2):
+        self.cache_dir = cache_dir
+        self.keep = keep
+        self.params_digest = _sha256(json.dumps(params, sort_keys=True).encode())
+        self.key = _sha256((csv_digest + self.params_digest).encode())[:16]
+        self.path = os.path.join(cache_dir, self.key)
+        self.topics_path = os.path.join(cache_dir, "topics")
+
+    def load_closed_form(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                rows = json.load(f)["rows"]
+            arrays = {
+                name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+                for name in self.ARRAYS
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        Y = arrays.pop("Y")
+        touch(self.path)
+        return ClosedFormModels(Y, arrays, rows)
+
+    def save_closed_form(self, closed_form):
+        os.makedirs(self.path, exist_ok=True)
+        arrays = dict(closed_form.fit, Y=closed_form.Y)
+        for name in self.ARRAYS:
+            np.save(os.path.join(self.path, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+        # meta.json is written last; its presence marks a complete entry.
+        self._write(os.path.join(self.path, "meta.json"), json.dumps({"rows": closed_form.rows}).encode())
+        prune_cache(self.cache_dir, r"[0-9a-f]{16}", self.keep)
+        if self.keep:
+            prune_cache(self.topics_path, r"[0-9a-f]{64}\.npy", self.keep * max(len(closed_form.rows), 1))
+
+    def open_table(self, closed_form, horizon, dtype="float32"):
+        # Memory-maps the table read-write, so rows filled by any process
+        # that opens it land in the file and are seen by the others.
+        suffix = f"{horizon}-{np.dtype(dtype).name}.npy"
+        values_path = os.path.join(self.path, f"forecasts-{suffix}")
+        models_path = os.path.join(self.path, f"models-{suffix}")
+        if not os.path.exists(models_path):
+            os.makedirs(self.path, exist_ok=True)
+            empty = ForecastTable.empty(closed_form.rows, len(closed_form.Y), horizon, dtype)
+            for path, array in [(values_path, empty.values), (models_path, empty.models)]:
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+        try:
+            return ForecastTable(
+                closed_form.rows, np.load(values_path, mmap_mode="r+"), np.load(models_path, mmap_mode="r+")
+            )
+        except (OSError, ValueError):
+            return None
+
+    def _topic_file(self, closed_form, topic, horizon):
+        values = np.asarray(closed_form.values(topic), dtype=np.float64)
+        key = self.params_digest.encode() + str(horizon).encode() + values.tobytes()
+        return os.path.join(self.topics_path, _sha256(key) + ".npy")
+
+    def load_topic(self, closed_form, topic, horizon):
+        # A topic file is the model code followed by the forecasts, read
+        # without pickle so the cache directory cannot hold code.
+        path = self._topic_file(closed_form, topic, horizon)
+        try:
+            stored = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        if stored.shape != (horizon + 1,) or stored[0] not in range(1, len(MODEL_NAMES)):
+            return None
+        touch(path)
+        return MODEL_NAMES[int(stored[0])], stored[1:]
+
+    def save_topic(self, closed_form, topic, horizon, ranked):
+        best_model, forecast = ranked
+        stored = np.concatenate([[MODEL_CODES[best_model]], np.asarray(forecast, dtype=np.float64)])
+        buffer = io.BytesIO()
+        np.save(buffer, stored, allow_pickle=False)
+        os.makedirs(self.topics_path, exist_ok=True)
+        self._write(self._topic_file(closed_form, topic, horizon), buffer.getvalue())
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def train_all_models_and_rank(df, topic_col="Business Head", horizon=24, dtype="float32"):
+    # Fills the forecast table of every topic, fitting a forest for each one
+    # that selected it.
+    closed_form = ClosedFormModels.from_frame(df, topic_col)
+    table = ForecastTable.empty(closed_form.rows, len(closed_form.Y), horizon, dtype)
+    table.fill_closed_form(closed_form)
+    for topic in closed_form.rows:
+        if topic not in table:
+            table.set(topic, *closed_form.forecast_topic(topic, horizon))
+    return table, table.best_models()
+
+
+class ModelRegistry:
+    # Forecasts for quarters 1..horizon of every topic live in one
+    # ForecastTable. Each topic's model is selected by walk-forward
+    # backtesting; topics that selected a closed-form model are filled in one
+    # vectorized pass, the others have a Random Forest fitted the first time
+    # they are forecast, which fills the topic's row and is then dropped, so
+    # answering a forecast is an array read.
+    def __init__(self, df, topic_col="Business Head", horizon=24, cache=None, mmap_table=False, dtype="float32"):
+        self.topic_col = topic_col
+        self.horizon = horizon
+        self.dtype = dtype
+        self.mmap_table = mmap_table
+        self.query_counts = Counter()
+        self.cache = cache
+        # Bumped on every reload, since refitted forests can forecast
+        # differently.
+        self.version = 0
+        self.closed_form = self._load_closed_form(df, cache)
+        self.table = self._open_table(self.closed_form, cache)
+        self._lock = threading.Lock()
+
+    def _load_closed_form(self, df, cache):
+        closed_form = cache.load_closed_form() if cache else None
+        if closed_form is None:
+            closed_form = ClosedFormModels.from_frame(df, self.topic_col)
+            if cache:
+                cache.save_closed_form(closed_form)
+        return closed_form
+
+    def _open_table(self, closed_form, cache):
+        table = cache.open_table(closed_form, self.horizon, self.dtype) if cache and self.mmap_table else None
+        if table is None:
+            table = ForecastTable.empty(closed_form.rows, len(closed_form.Y), self.horizon, self.dtype)
+        table.fill_closed_form(closed_form)
+        return table
+
+    def reload(self, df, cache=None, horizon=None):
+        # Returns a registry for the new sheet, which keeps the forecasts of
+        # topics whose values did not change, and the filled topics that
+        # were dropped and need refitting. This registry is left untouched,
+        # so queries still holding it answer from the sheet they started on.
+        registry = ModelRegistry(df, self.topic_col, horizon or self.horizon, cache, self.mmap_table, self.dtype)
+        registry.query_counts, registry._lock = self.query_counts, self._lock
+        registry.version = self.version + 1
+        closed_form, table = registry.closed_form, registry.table
+        refit = []
+        with self._lock:
+            for topic in [topic for topic in self.table.rows if topic in self.table]:
+                if topic not in closed_form.rows or topic in table:
+                    continue
+                if registry.horizon == self.horizon and closed_form.values(topic) == self.closed_form.values(topic):
+                    forecast, best_model = self.table.get(topic)
+                    table.set(topic, best_model, forecast)
+                else:
+                    refit.append(topic)
+        return registry, refit
+
+    def __contains__(self, topic):
+        return topic in self.closed_form.rows
+
+    def __len__(self):
+        return len(self.closed_form.rows)
+
+    def get(self, topic):
+        # Returns the topic's forecasts for quarters 1..horizon and the name
+        # of the model they come from.
+        if topic not in self:
+            return None
+
+        with self._lock:
+            self.query_counts[topic] += 1
+        entry = self.table.get(topic)
+        if entry is not None:
+            return entry
+        return self._fit(topic)
+
+    def _rank(self, topic, closed_form, cache):
+        if cache is None or closed_form.best_model(topic) != "random_forest":
+            return closed_form.forecast_topic(topic, self.horizon)
+
+        ranked = cache.load_topic(closed_form, topic, self.horizon)
+        if ranked is None:
+            ranked = closed_form.forecast_topic(topic, self.horizon)
+            cache.save_topic(closed_form, topic, self.horizon, ranked)
+        return ranked
+
+    def _fit(self, topic):
+        if topic not in self.closed_form.rows:
+            return None
+        best_model, forecast = self._rank(topic, self.closed_form, self.cache)
+        with self._lock:
+            if topic not in self.table:
+                self.table.set(topic, best_model, forecast)
+        return self.table.get(topic)
+
+    def is_fitted(self, topic):
+        return topic in self.table
+
+    def warm_up(self, topics=None, limit=10, background=True):
+        if topics is None:
+            with self._lock:
+                topics = [t for t, _ in self.query_counts.most_common(limit)]
+        topics = [t for t in topics if t in self]
+
+        def run():
+            for topic in topics:
+                if not self.is_fitted(topic):
+                    self._fit(topic)
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
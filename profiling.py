@@ -0,0 +1,180 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Histogram bucket upper bounds in seconds: 1 µs doubling up to ~67 s.
+BUCKET_BOUNDS = [1e-6 * 2 ** i for i in range(27)]
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("timer", "stage", "start")
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class StageTimer:
+    # Per-stage latency histograms. Inside a query (begin/end) span times
+    # are summed per stage and recorded once when the query ends; the time
+    # not covered by any span is recorded as "format". Spans outside a
+    # query, e.g. from answer_many batches, are recorded as they close.
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._counts = defaultdict(lambda: [0] * (len(BUCKET_BOUNDS) + 1))
+        self._totals = Counter()
+        self._max = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, stage):
+        return _Span(self, stage) if self.enabled else NULL_SPAN
+
+    def begin(self):
+        if self.enabled:
+            self._local.stages = Counter()
+            self._local.start = time.perf_counter()
+
+    def end(self):
+        stages = getattr(self._local, "stages", None)
+        if stages is None:
+            return None
+        total = time.perf_counter() - self._local.start
+        self._local.stages = None
+        stages["format"] = max(total - sum(stages.values()), 0.0)
+        stages["total"] = total
+        self.record(stages)
+        return stages
+
+    def add(self, stage, seconds):
+        stages = getattr(self._local, "stages", None)
+        if stages is not None:
+            stages[stage] += seconds
+        else:
+            self.record({stage: seconds})
+
+    def record(self, stages):
+        with self._lock:
+            for stage, seconds in stages.items():
+                self._counts[stage][bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+                self._totals[stage] += seconds
+                self._max[stage] = max(self._max[stage], seconds)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._totals.clear()
+            self._max.clear()
+
+    def _quantile(self, counts, q):
+        # Upper bound of the bucket holding the q-th observation.
+        rank = q * sum(counts)
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if count and seen >= rank:
+                return BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else float("inf")
+        return 0.0
+
+    def snapshot(self):
+        with self._lock:
+            stats = {}
+            for stage, counts in self._counts.items():
+                count = sum(counts)
+                stats[stage] = {
+                    "count": count,
+                    "mean_ms": self._totals[stage] / count * 1000,
+                    "p50_ms": self._quantile(counts, 0.5) * 1000,
+                    "p99_ms": self._quantile(counts, 0.99) * 1000,
+                    "max_ms": self._max[stage] * 1000,
+                    "buckets_ms": {
+                        f"{BUCKET_BOUNDS[i] * 1000:g}" if i < len(BUCKET_BOUNDS) else "inf": c
+                        for i, c in enumerate(counts) if c
+                    },
+                }
+            return stats
+
+
+class SamplingProfiler:
+    # Samples the stacks of all other threads every `interval` seconds from
+    # a background thread. Costs nothing until started; the sampled code is
+    # never instrumented.
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return self.report()
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return self.report()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        # "a;b;c count" lines, the input format of flamegraph tools.
+        return "\n".join(f"{';'.join(stack)} {count}" for stack, count in self._stacks.most_common())
+
+    def report(self, limit=20):
+        own, inclusive = Counter(), Counter()
+        for stack, count in list(self._stacks.items()):
+            own[stack[-1]] += count
+            for name in set(stack):
+                inclusive[name] += count
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "self": own.most_common(limit),
+            "inclusive": inclusive.most_common(limit),
+        }
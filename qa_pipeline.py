@@ -1,225 +1,906 @@
-
-import re
-from fuzzywuzzy import process
-from transformers import pipeline, AutoTokenizer, AutoModelForQuestionAnswering
-from config import TOPIC_ALIASES, QUARTER_MAPPING, MODEL_CONFIG
-from loader import load_csv
-from ml_predictor import train_all_models_and_rank
-import pandas as pd
-
-def convert_natural_quarter_phrasing(question: str, current_max_quarter: int = 4) -> str:
-    original_query = question.lower()
-
-    match = re.search(r"(q[1-4])(?:\s+of)?\s+(next year|coming year|following year)", original_query)
-    if match:
-        q = match.group(1)
-        q_num = int(q[1])
-        new_q = (current_max_quarter - (current_max_quarter % 4)) + q_num + 4
-        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
-
-    match = re.search(r"(next|second|third|fourth)\s+quarter", original_query)
-    if match:
-        mapping = {"next": 1, "second": 2, "third": 3, "fourth": 4}
-        offset = mapping.get(match.group(1))
-        new_q = current_max_quarter + offset
-        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
-
-    match = re.search(r"in\s+(\d+)\s+quarters?", original_query)
-    if match:
-        offset = int(match.group(1))
-        new_q = current_max_quarter + offset
-        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
-
-    return question
-
-
-def format_currency(number):
-    s = str(int(float(number)))
-    r = s[-3:]
-    s = s[:-3]
-    while len(s) > 2:
-        r = s[-2:] + "," + r
-        s = s[:-2]
-    if s:
-        r = s + "," + r
-    return f"Rs {r}"
-
-class FinancialQASystem:
-    def __init__(self, model_path=None, csv_path=None):
-        self.model_path = model_path or MODEL_CONFIG["model_path"]
-        self.csv_path = csv_path or MODEL_CONFIG["csv_path"]
-        self.topic_column = MODEL_CONFIG["topic_column"].lower()
-        self.df = load_csv(self.csv_path)
-        self.df.columns = [col.lower() for col in self.df.columns]
-        self.df[self.topic_column] = self.df[self.topic_column].str.lower()
-        self.qa_pipeline = self._load_model()
-        self.models, self.best_model_map = train_all_models_and_rank(self.df)
-
-    def _load_model(self):
-        tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-        model = AutoModelForQuestionAnswering.from_pretrained(self.model_path)
-        return pipeline("question-answering", model=model, tokenizer=tokenizer)
-
-    def parse_question(self, question):
-        question = question.lower()
-        quarter = next((mapped for term, mapped in QUARTER_MAPPING.items() if term in question), None)
-        topic = next((canonical for alias, canonical in TOPIC_ALIASES.items() if alias in question), None)
-
-        if not topic:
-            best_match, score = process.extractOne(
-                question, self.df[self.topic_column].tolist()
-            )
-            topic = best_match.strip().lower() if score > 60 else None
-
-        return topic, quarter
-
-    def get_value(self, topic, quarter):
-        topic = topic.strip().lower()
-        quarter = quarter.strip().lower() if quarter else None
-
-        if topic not in self.df[self.topic_column].values:
-            return None
-
-        row = self.df[self.df[self.topic_column] == topic]
-        if quarter in self.df.columns:
-            value = row[quarter].values[0]
-            return value if pd.notna(value) else None
-
-        return None
-
-    def handle_complex_query(self, question):
-        question_lower = question.lower()
-        topic, _ = self.parse_question(question_lower)
-        if not topic:
-            return "❌ Could not identify the topic."
-
-        if any(word in question_lower for word in ["predict", "forecast", "estimate", "next quarter", "future"]):
-            return self.predict_future(topic, question_lower)
-
-        if "did" in question_lower or "was" in question_lower:
-            return self._process_yesno(question_lower, topic)
-        elif "growth" in question_lower or "change" in question_lower:
-            return self._process_growth(question_lower, topic)
-        elif "compare" in question_lower or "vs" in question_lower:
-            return self._process_comparison(question_lower, topic)
-        return None
-
-    def _extract_quarters(self, question):
-        matches = []
-        for phrase, mapped in QUARTER_MAPPING.items():
-            if phrase in question:
-                matches.append(mapped)
-        seen = set()
-        unique_matches = []
-        for m in matches:
-            if m not in seen:
-                unique_matches.append(m)
-                seen.add(m)
-        return unique_matches
-
-
-
-    def _process_yesno(self, question, topic):
-        qtrs = self._extract_quarters(question)
-        if len(qtrs) >= 2:
-            val1, val2 = self.get_value(topic, qtrs[0]), self.get_value(topic, qtrs[1])
-            if val1 and val2:
-                val1, val2 = float(val1), float(val2)
-                increase = val2 > val1
-                direction = "increased" if increase else "decreased"
-                change = (val2 - val1) / val1 * 100
-                answer = "yes" if (
-                    ("increase" in question and increase) or 
-                    ("decrease" in question and not increase)
-                ) else "no"
-                return f"{topic} {direction} from {val1} to {val2} ({abs(change):.2f}%). Answer: {answer}"
-        return f"❌ Could not find {topic} data for required quarters."
-
-    def _process_growth(self, question, topic):
-        qtrs = self._extract_quarters(question)
-        if "past year" in question or "year over year" in question:
-            qtrs = ["q3", "q4"]
-        if len(qtrs) >= 2:
-            val1, val2 = self.get_value(topic, qtrs[0]), self.get_value(topic, qtrs[1])
-            if val1 and val2:
-                val1, val2 = float(val1), float(val2)
-                change = (val2 - val1) / val1 * 100
-                direction = "increased" if change > 0 else "decreased"
-                return f"{topic} {direction} by {abs(change):.2f}% from {qtrs[0]} to {qtrs[1]}"
-        return f"❌ Could not compute growth for {topic}."
-
-    def _process_comparison(self, question, topic):
-        qtrs = self._extract_quarters(question)
-        if len(qtrs) >= 2:
-            val1 = self.get_value(topic, qtrs[0])
-            val2 = self.get_value(topic, qtrs[1])
-
-            print(f"[DEBUG] {topic} - {qtrs[0]}: {val1}, {qtrs[1]}: {val2}")
-
-            try:
-                val1 = float(val1)
-                val2 = float(val2)
-                change = (val2 - val1) / val1 * 100
-                direction = "Increase" if change >= 0 else "Decrease"
-                return f"{topic} changed from {val1} ({qtrs[0]}) to {val2} ({qtrs[1]}). {direction} of {abs(change):.2f}%"
-            except (TypeError, ValueError):
-                return f"❌ Could not compare values for {topic} — invalid or missing numbers in {qtrs[0]} or {qtrs[1]}."
-
-        return f"❌ Could not compare values for {topic}."
-
-
-    def predict_future(self, topic, question):
-        match = re.search(r"q(\d+)", question.lower())
-        if match:
-            future_quarter = f"q{match.group(1)}"
-        else:
-            future_quarter = "q5"  
-
-        quarter_num = {f"q{i}": i for i in range(1, 25)}
-
-        if topic not in self.models or topic not in self.best_model_map:
-            return f"❌ No model available for {topic}."
-
-        best_model = self.best_model_map[topic]
-        model = self.models[topic][best_model]
-
-        q_number = quarter_num.get(future_quarter)
-        if not q_number:
-            return f"❌ Unsupported quarter: {future_quarter.upper()}."
-
-        if best_model == "average_growth":
-            pred = model([[q_number]])[0]
-        else:
-            pred = model.predict([[q_number]])[0]
-
-        model_name = {
-            "linear_regression": "Linear Regression",
-            "random_forest": "Random Forest",
-            "average_growth": "Average Growth"
-        }.get(best_model, best_model)
-
-        return f"{topic.title()}'s {future_quarter.upper()} predicted revenue is {format_currency(pred)} (using {model_name})."
-
-
-
-    def answer_query(self, question):
-        question = convert_natural_quarter_phrasing(question, current_max_quarter=4)  # You can replace 4 with dynamic max if needed
-        complex_response = self.handle_complex_query(question)
-        if complex_response is not None:
-            return complex_response
-
-        topic, quarter = self.parse_question(question)
-        if topic and quarter:
-            value = self.get_value(topic, quarter)
-            if value:
-                return f"{topic} in {quarter.upper()} is {value}."
-            else:
-                return f"❌ No data available for '{topic}' in '{quarter.upper()}'." 
-
-        if not topic:
-            return "❌ Could not identify a valid topic in your question."
-        if not quarter:
-            return "❌ Could not identify a valid quarter or time period."
-
-        return "❌ Could not understand your query. Please rephrase."
-
+
+import logging
+import mmap
+import os
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+from config import TOPIC_ALIASES, QUARTER_MAPPING, MODEL_CONFIG
+from loader import load_csv, quarter_columns, topic_context, year_quarter
+from ml_predictor import ForecastCache, ModelRegistry
+from matcher import FuzzyTopicIndex, QuestionMatcher, year_quarter_mentions
+from answer_cache import AnswerCache
+from aggregates import TopicAggregates
+from profiling import SamplingProfiler, StageTimer
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+QUESTION_MATCHER = QuestionMatcher(TOPIC_ALIASES, QUARTER_MAPPING)
+
+NEXT_YEAR_PATTERN = re.compile(r"(q[1-4])(?:\s+of)?\s+(next year|coming year|following year)")
+QUARTER_OFFSET_PATTERN = re.compile(r"(next|second|third|fourth)\s+quarter")
+QUARTERS_AHEAD_PATTERN = re.compile(r"in\s+(\d+)\s+quarters?")
+
+# Cross-topic questions: rankings, fastest growth, totals and topic vs topic.
+AGGREGATE_HINT = re.compile(r"\b(?:top|bottom|highest|lowest|best|worst|most|least|fastest|slowest|biggest|smallest|largest|rank\w*|total|sum|combined|overall|vs|versus|against|compare)\b")
+RANK_PATTERN = re.compile(r"\b(?:top|bottom|highest|lowest|best|worst|most|least|fastest|slowest|biggest|smallest|largest|rank\w*)\b")
+CROSS_TOPIC_PATTERN = re.compile(r"\b(?:who|which|whose|heads?|everyone|top|bottom|rank\w*)\b")
+ASCENDING_PATTERN = re.compile(r"\b(?:bottom|lowest|worst|least|slowest|smallest)\b")
+GROWTH_PATTERN = re.compile(r"\b(?:grew|grow|grown|growth|growing|increase[ds]?|change[ds]?)\b")
+RANK_COUNT_PATTERN = re.compile(r"\b(?:top|bottom|best|worst)\s+(\d+)\b|\b(\d+)\s+(?:heads|topics|people)\b")
+TOTAL_PATTERN = re.compile(r"\b(?:total|sum|combined|overall)\b")
+ALL_TOPICS_PATTERN = re.compile(r"\b(?:all|across|every|everyone|combined|overall|company)\b")
+VERSUS_PATTERN = re.compile(r"\s+(?:vs\.?|versus|against)\s+")
+COMPARE_PAIR_PATTERN = re.compile(r"\bcompare\s+(.+?)\s+(?:and|with)\s+(.+)")
+JOIN_PATTERN = re.compile(r"\s+(?:and|&)\s+|\s*,\s*")
+QUARTER_NUMBER_PATTERN = re.compile(r"\bq(\d+)\b")
+QUARTER_FILLER_PATTERN = re.compile(r"\bq\d+\b|\b(?:in|for|of|by|revenue|value|the)\b|[?.!,]")
+
+
+def convert_natural_quarter_phrasing(question: str, current_max_quarter: int = 4) -> str:
+    original_query = question.lower()
+    if "year" not in original_query and "quarter" not in original_query:
+        return question
+
+    match = NEXT_YEAR_PATTERN.search(original_query)
+    if match:
+        q = match.group(1)
+        q_num = int(q[1])
+        new_q = (current_max_quarter - (current_max_quarter % 4)) + q_num + 4
+        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
+
+    match = QUARTER_OFFSET_PATTERN.search(original_query)
+    if match:
+        mapping = {"next": 1, "second": 2, "third": 3, "fourth": 4}
+        offset = mapping.get(match.group(1))
+        new_q = current_max_quarter + offset
+        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
+
+    match = QUARTERS_AHEAD_PATTERN.search(original_query)
+    if match:
+        offset = int(match.group(1))
+        new_q = current_max_quarter + offset
+        question = re.sub(re.escape(match.group(0)), f"Q{new_q}", question, flags=re.IGNORECASE)
+
+    return question
+
+
+def format_currency(number):
+    s = str(int(float(number)))
+    r = s[-3:]
+    s = s[:-3]
+    while len(s) > 2:
+        r = s[-2:] + "," + r
+        s = s[:-2]
+    if s:
+        r = s + "," + r
+    return f"Rs {r}"
+
+class LookupStore:
+    # Precomputed lookup store: topic -> row index and column -> contiguous
+    # float64 array. The DataFrame it is built from stays the source of truth.
+    def __init__(self, df, topic_column):
+        self.topic_index = {}
+        for i, topic in enumerate(df[topic_column].tolist()):
+            # Blank topics (e.g. a grand-total row) are not heads.
+            if isinstance(topic, str) and topic:
+                self.topic_index.setdefault(topic, i)
+
+        self.columns = {}
+        for col in df.columns:
+            if col == topic_column:
+                continue
+            values = pd.to_numeric(df[col], errors="coerce")
+            self.columns[col] = np.ascontiguousarray(values.to_numpy(dtype=np.float64, na_value=np.nan))
+
+        # Year-quarter columns ("2023 q1") are also reachable as "q<n>".
+        quarters = quarter_columns(self.columns)
+        self.aliases = {f"q{n}": col for col, n in quarters if col != f"q{n}"}
+        self.year_quarters = {year_quarter(col): n for col, n in quarters if year_quarter(col)}
+        self.max_quarter = max((n for _, n in quarters), default=4)
+        self._aggregates = None
+
+    @property
+    def aggregates(self):
+        # Built on the first cross-topic question; a reload builds a new store.
+        if self._aggregates is None:
+            self._aggregates = TopicAggregates(self)
+        return self._aggregates
+
+    def resolve_year_quarters(self, question):
+        # Rewrites "2024 q1"-style phrases to the sheet's "q<n>" index.
+        # Returns (question, None), or (question, phrase) for the first
+        # phrase naming a quarter the sheet does not have. Sheets without
+        # year-quarter columns are left as they are.
+        if not self.year_quarters:
+            return question, None
+        parts, last = [], 0
+        for start, end, year, quarter in year_quarter_mentions(question):
+            n = self.year_quarters.get((year, quarter))
+            if n is None:
+                return question, question[start:end]
+            parts += [question[last:start], f"q{n}"]
+            last = end
+        return "".join(parts) + question[last:], None
+
+    def column(self, name):
+        return self.columns.get(self.aliases.get(name, name))
+
+    def share(self):
+        # Move the quarter columns into one anonymous shared mapping, so
+        # forked workers read the same physical pages instead of each
+        # faulting in a private copy.
+        names = list(self.columns)
+        rows = len(self.columns[names[0]]) if names else 0
+        block = mmap.mmap(-1, max(len(names) * rows * 8, 1))
+        matrix = np.frombuffer(block, dtype=np.float64, count=len(names) * rows).reshape(len(names), rows)
+        for i, name in enumerate(names):
+            matrix[i] = self.columns[name]
+            self.columns[name] = matrix[i]
+        return self
+
+    def get(self, topic, column):
+        idx = self.topic_index.get(topic)
+        if idx is None:
+            return None
+
+        values = self.column(column)
+        if values is None:
+            return None
+
+        value = values[idx]
+        return value if not np.isnan(value) else None
+
+    def changed_topics(self, old):
+        topics = set(self.topic_index)
+        old_topics = set(old.topic_index)
+        if self.columns.keys() != old.columns.keys():
+            return topics | old_topics
+
+        common = sorted(topics & old_topics, key=self.topic_index.get)
+        rows = [self.topic_index[t] for t in common]
+        old_rows = [old.topic_index[t] for t in common]
+        same = np.ones(len(common), dtype=bool)
+        for col, values in self.columns.items():
+            new, prev = values[rows], old.columns[col][old_rows]
+            same &= (new == prev) | (np.isnan(new) & np.isnan(prev))
+
+        changed = {t for t, unchanged in zip(common, same) if not unchanged}
+        return changed | (topics ^ old_topics)
+
+
+class Sheet:
+    # One version of the CSV and everything answered from it. A reload
+    # builds a new Sheet and swaps it in with one assignment.
+    def __init__(self, df, digest, store, fuzzy_index, predictor, version):
+        self.df = df
+        self.digest = digest
+        self.store = store
+        self.fuzzy_index = fuzzy_index
+        self.predictor = predictor
+        self.version = version
+        self.retriever = None
+
+
+class FinancialQASystem:
+    # Startup steps reported to the optional progress(step, total, message)
+    # callback, e.g. by a UI that builds the system in the background.
+    STARTUP_STEPS = ["Reading CSV", "Indexing topics", "Fitting forecasting models", "Ready"]
+
+    def __init__(self, model_path=None, csv_path=None, progress=None):
+        def report(step):
+            if progress is not None:
+                progress(step, len(self.STARTUP_STEPS), self.STARTUP_STEPS[step])
+
+        self.model_path = model_path or MODEL_CONFIG["model_path"]
+        self.csv_path = csv_path or MODEL_CONFIG["csv_path"]
+        self.topic_column = MODEL_CONFIG["topic_column"].lower()
+        report(0)
+        self._csv_stat = self._stat_csv()
+        df, digest = self._read_csv()
+        report(1)
+        store = LookupStore(df, self.topic_column)
+        fuzzy_index = FuzzyTopicIndex(df[self.topic_column].tolist())
+        # The extractive QA model is loaded on first use; qa_mode "rules"
+        # never loads it and answers from rules and forecasts only.
+        self.qa_mode = MODEL_CONFIG.get("qa_mode", "full")
+        self._qa_pipeline = None
+        self._qa_lock = threading.Lock()
+        report(2)
+        predictor = ModelRegistry(
+            df, MODEL_CONFIG["topic_column"],
+            horizon=store.max_quarter + MODEL_CONFIG.get("forecast_horizon", 20),
+            cache=self._forecast_cache(digest),
+            mmap_table=MODEL_CONFIG.get("forecast_table_mmap", False),
+            dtype=MODEL_CONFIG.get("forecast_dtype", "float32")
+        )
+        self._sheet = Sheet(df, digest, store, fuzzy_index, predictor, 0)
+        self._local = threading.local()
+        if MODEL_CONFIG.get("warm_up_topics"):
+            self.predictor.warm_up(MODEL_CONFIG["warm_up_topics"])
+        self.answer_cache = AnswerCache(
+            MODEL_CONFIG.get("answer_cache_size", 1024), MODEL_CONFIG.get("answer_cache_ttl")
+        )
+        # Per-stage latency histograms (parse, resolve, lookup, predict, qa,
+        # format, total) and an optional sampling profiler.
+        self.stage_timer = StageTimer(MODEL_CONFIG.get("stage_timing", True))
+        self.profiler = None
+        if MODEL_CONFIG.get("profiler_interval"):
+            self.start_profiler(MODEL_CONFIG["profiler_interval"])
+        self._reload_lock = threading.Lock()
+        self._watch_stop = None
+        report(3)
+
+    @property
+    def sheet(self):
+        # The sheet pinned by the query running on this thread, else the
+        # latest one.
+        return getattr(self._local, "sheet", None) or self._sheet
+
+    @contextmanager
+    def _pinned(self):
+        # Every read of a query goes through the sheet pinned here, so one
+        # answer never mixes two versions of the CSV; queries in flight
+        # during a reload finish on the sheet they started with.
+        if getattr(self._local, "sheet", None) is not None:
+            yield
+            return
+        self._local.sheet = self._sheet
+        try:
+            yield
+        finally:
+            self._local.sheet = None
+
+    @property
+    def df(self):
+        return self.sheet.df
+
+    @property
+    def fuzzy_index(self):
+        return self.sheet.fuzzy_index
+
+    @property
+    def predictor(self):
+        return self.sheet.predictor
+
+    @property
+    def current_max_quarter(self):
+        return self.sheet.store.max_quarter
+
+    @property
+    def forecast_horizon(self):
+        # Forecasts cover quarters 1..forecast_horizon.
+        return self.current_max_quarter + MODEL_CONFIG.get("forecast_horizon", 20)
+
+    @property
+    def data_version(self):
+        sheet = self.sheet
+        return (sheet.version, sheet.predictor.version)
+
+    def _read_csv(self):
+        # Returns the frame and the SHA-256 of the bytes it was read from,
+        # which keys the Parquet, forecast and retrieval caches alike.
+        return load_csv(
+            self.csv_path, lowercase_columns=True, cache_dir=MODEL_CONFIG.get("data_cache_dir"), return_digest=True
+        )
+
+    def _stat_csv(self):
+        stat = os.stat(self.csv_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _forecast_cache(self, csv_digest):
+        cache_dir = MODEL_CONFIG.get("forecast_cache_dir")
+        keep = MODEL_CONFIG.get("cache_keep_versions", 2)
+        return ForecastCache(cache_dir, csv_digest, keep=keep) if cache_dir else None
+
+    def reload(self, force=False):
+        # The new sheet is built on the side and swapped in with one
+        # assignment; queries pin a sheet (see _pinned), so those in flight
+        # finish on the old one.
+        with self._reload_lock:
+            stat = self._stat_csv()
+            if stat == self._csv_stat and not force:
+                return set()
+
+            old = self._sheet
+            df, digest = self._read_csv()
+            store = LookupStore(df, self.topic_column)
+            changed = store.changed_topics(old.store)
+            fuzzy_index = old.fuzzy_index
+            if store.topic_index.keys() != old.store.topic_index.keys():
+                fuzzy_index = FuzzyTopicIndex(df[self.topic_column].tolist())
+
+            horizon = store.max_quarter + MODEL_CONFIG.get("forecast_horizon", 20)
+            predictor, refit = old.predictor.reload(df, cache=self._forecast_cache(digest), horizon=horizon)
+            sheet = Sheet(df, digest, store, fuzzy_index, predictor, old.version + 1)
+            if old.retriever:
+                self._rebuild_retriever(sheet, old.retriever)
+            self._sheet = sheet
+            self._csv_stat = stat
+
+            if refit:
+                predictor.warm_up(refit)
+            return changed
+
+    def _rebuild_retriever(self, sheet, previous):
+        # Rebuilt off the query path from the previous index, embedding only
+        # the sentences that changed. Until it is ready the new sheet has no
+        # retriever (False), so free-form questions use whole rows as
+        # context instead of waiting for the embeddings.
+        sheet.retriever = False
+
+        def run():
+            try:
+                from retrieval import ContextIndex
+
+                sheet.retriever = ContextIndex(
+                    sheet.df, self.topic_column, sheet.digest,
+                    MODEL_CONFIG["retrieval_model"], MODEL_CONFIG.get("retrieval_cache_dir"),
+                    keep=MODEL_CONFIG.get("cache_keep_versions", 2), previous=previous
+                )
+            except (OSError, ImportError, ValueError) as e:
+                logger.warning("❌ Could not rebuild retrieval index, using whole rows as QA context: %s", e)
+
+        thread = threading.Thread(target=run, name="retrieval-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    def watch_csv(self, interval=None):
+        # Reloads the CSV whenever it changes, polling every interval seconds
+        # (csv_reload_interval by default). Only the long-running entry
+        # points start this, so benchmark probes, batch runs and tests don't
+        # each poll the sheet.
+        self.stop_watching()
+        interval = interval or MODEL_CONFIG.get("csv_reload_interval")
+        if not interval:
+            return
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    logger.warning("❌ Could not reload %s: %s", self.csv_path, e)
+
+        self._watch_stop = stop
+        threading.Thread(target=run, name="csv-watcher", daemon=True).start()
+
+    def stop_watching(self):
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+
+    def stage_stats(self):
+        return self.stage_timer.snapshot()
+
+    def start_profiler(self, interval=0.005):
+        if self.profiler is None or not self.profiler.running:
+            self.profiler = SamplingProfiler(interval)
+            self.profiler.start()
+        return self.profiler
+
+    def stop_profiler(self):
+        return self.profiler.stop() if self.profiler is not None else None
+
+    def preload(self):
+        # Build everything that is otherwise loaded on first use, e.g. before
+        # forking workers so they inherit one copy-on-write copy of it.
+        if self.qa_mode != "rules":
+            try:
+                self.qa_pipeline
+                self.retriever
+            except (OSError, ImportError) as e:
+                logger.warning("❌ Could not load QA model from %s, answering from rules only: %s", self.model_path, e)
+                self.qa_mode = "rules"
+        self.predictor.warm_up(MODEL_CONFIG.get("warm_up_topics") or None, background=False)
+        self.sheet.store.share()
+        self.sheet.store.aggregates
+
+    @property
+    def qa_pipeline(self):
+        if self.qa_mode == "rules":
+            return None
+        if self._qa_pipeline is None:
+            with self._qa_lock:
+                if self._qa_pipeline is None:
+                    self._qa_pipeline = self._load_model()
+        return self._qa_pipeline
+
+    def _load_model(self):
+        if not os.path.isdir(self.model_path):
+            raise OSError(f"model directory '{self.model_path}' not found")
+        from extractive_qa import ExtractiveQA
+
+        return ExtractiveQA(
+            self.model_path,
+            quantize=MODEL_CONFIG.get("qa_quantize", True),
+            batch_size=MODEL_CONFIG.get("qa_batch_size", 16)
+        )
+
+    @property
+    def retriever(self):
+        sheet = self.sheet
+        if not MODEL_CONFIG.get("retrieval_model") or sheet.retriever is False:
+            return None
+        if sheet.retriever is None:
+            with self._qa_lock:
+                if sheet.retriever is None:
+                    try:
+                        from retrieval import ContextIndex
+
+                        sheet.retriever = ContextIndex(
+                            sheet.df, self.topic_column, sheet.digest,
+                            MODEL_CONFIG["retrieval_model"], MODEL_CONFIG.get("retrieval_cache_dir"),
+                            keep=MODEL_CONFIG.get("cache_keep_versions", 2)
+                        )
+                    except (OSError, ImportError, ValueError) as e:
+                        logger.warning("❌ Could not build retrieval index, using whole rows as QA context: %s", e)
+                        sheet.retriever = False
+                        return None
+        return sheet.retriever
+
+    def _extract_answers(self, questions, topics):
+        if not questions:
+            return []
+        try:
+            model = self.qa_pipeline
+        except (OSError, ImportError) as e:
+            logger.warning("❌ Could not load QA model from %s, answering from rules only: %s", self.model_path, e)
+            self.qa_mode = "rules"
+            model = None
+        if model is None:
+            return [None] * len(questions)
+
+        with self.stage_timer.span("qa"):
+            retriever = self.retriever
+            if retriever is not None:
+                contexts = retriever.contexts(questions, topics, k=MODEL_CONFIG.get("retrieval_top_k", 3))
+            else:
+                store = self.sheet.store
+                contexts = [
+                    topic_context(topic, {col: store.get(topic, col) for col in store.columns})
+                    for topic in topics
+                ]
+            results = model.answer(questions, contexts)
+        answers = []
+        for topic, result in zip(topics, results):
+            answers.append(f"{topic}: {result[0]}" if result else None)
+        return answers
+
+    def parse_question(self, question):
+        with self.stage_timer.span("parse"):
+            question = question.lower()
+            topic, quarters = QUESTION_MATCHER.scan(question)
+            quarter = quarters[0] if quarters else None
+
+        if not topic:
+            with self.stage_timer.span("resolve"):
+                topic = self.fuzzy_index.resolve(question)
+
+        return topic, quarter
+
+    def _parse(self, question):
+        # parse_question without stage timings.
+        topic, quarters = QUESTION_MATCHER.scan(question.lower())
+        return topic or self.fuzzy_index.resolve(question.lower()), quarters[0] if quarters else None
+
+    def get_value(self, topic, quarter):
+        topic = topic.strip().lower()
+        quarter = quarter.strip().lower() if quarter else None
+        with self.stage_timer.span("lookup"):
+            return self.sheet.store.get(topic, quarter)
+
+    def _intent(self, question_lower):
+        if any(word in question_lower for word in ["predict", "forecast", "estimate", "next quarter", "future"]):
+            return "forecast"
+
+        if "did" in question_lower or "was" in question_lower:
+            return "yesno"
+        elif "growth" in question_lower or "change" in question_lower:
+            return "growth"
+        elif "compare" in question_lower or "vs" in question_lower:
+            return "comparison"
+        return "lookup"
+
+    def handle_complex_query(self, question):
+        question_lower = question.lower()
+        topic, _ = self.parse_question(question_lower)
+        aggregate = self._process_aggregate(question_lower, topic)
+        if aggregate is not None:
+            return aggregate
+        if not topic:
+            return "❌ Could not identify the topic."
+
+        intent = self._intent(question_lower)
+        if intent == "forecast":
+            return self.predict_future(topic, question_lower)
+        if intent == "yesno":
+            return self._process_yesno(question_lower, topic)
+        elif intent == "growth":
+            return self._process_growth(question_lower, topic)
+        elif intent == "comparison":
+            return self._process_comparison(question_lower, topic)
+        return None
+
+    def _extract_quarters(self, question):
+        return list(QUESTION_MATCHER.scan(question)[1])
+
+
+
+    def _question_quarters(self, question):
+        # Quarters in the order the question mentions them.
+        quarters = [f"q{n}" for n in QUARTER_NUMBER_PATTERN.findall(question)]
+        if not quarters:
+            quarters = [q for q in self._extract_quarters(question) if QUARTER_NUMBER_PATTERN.fullmatch(q)]
+        return list(dict.fromkeys(quarters))
+
+    def _side_topic(self, text):
+        topic, _ = QUESTION_MATCHER.scan(text)
+        if topic:
+            return topic
+        text = QUARTER_FILLER_PATTERN.sub(" ", text.replace("compare", " ")).strip()
+        return self.fuzzy_index.resolve(text) if len(text) >= 3 else None
+
+    def _process_aggregate(self, question, topic):
+        # None unless the question is about several topics at once. topic is
+        # what parse_question resolved; rankings and totals over every topic
+        # only apply when the question names no single head.
+        if not AGGREGATE_HINT.search(question):
+            return None
+        with self.stage_timer.span("aggregate"):
+            answer = None
+            if "compare" in question or VERSUS_PATTERN.search(question):
+                answer = self._compare_topics(question)
+            if answer is None and TOTAL_PATTERN.search(question) and JOIN_PATTERN.search(question):
+                answer = self._total_named_topics(question)
+            if answer is not None:
+                return answer
+
+            if topic:
+                return None
+            if RANK_PATTERN.search(question) and CROSS_TOPIC_PATTERN.search(question):
+                return self._rank_topics(question)
+            if TOTAL_PATTERN.search(question) and ALL_TOPICS_PATTERN.search(question):
+                return self._total_topics(question)
+        return None
+
+    def _compare_topics(self, question):
+        parts = VERSUS_PATTERN.split(question, maxsplit=1)
+        if len(parts) != 2:
+            match = COMPARE_PAIR_PATTERN.search(question)
+            if not match:
+                return None
+            parts = list(match.groups())
+        first, second = self._side_topic(parts[0]), self._side_topic(parts[1])
+        if not first or not second or first == second:
+            return None
+
+        aggregates = self.sheet.store.aggregates
+        quarters = self._question_quarters(question)
+        quarter = quarters[0] if quarters else None
+        label = quarter.upper() if quarter else "total"
+        val1, val2 = aggregates.get(first, quarter), aggregates.get(second, quarter)
+        for topic, value in ((first, val1), (second, val2)):
+            if value is None:
+                return f"❌ No data available for '{topic}' in '{label}'."
+
+        (leader, top), (other, low) = sorted(((first, val1), (second, val2)), key=lambda item: -item[1])
+        if top == low:
+            return f"In {label}, {first} and {second} are level at {format_currency(top)}."
+        lead = f" ({(top - low) / low * 100:.2f}%)" if low else ""
+        return (
+            f"In {label}, {leader} ({format_currency(top)}) is ahead of {other} ({format_currency(low)}) "
+            f"by {format_currency(top - low)}{lead}."
+        )
+
+    def _rank_topics(self, question):
+        aggregates = self.sheet.store.aggregates
+        ascending = bool(ASCENDING_PATTERN.search(question))
+        match = RANK_COUNT_PATTERN.search(question)
+        if match:
+            k = int(match.group(1) or match.group(2))
+        else:
+            k = 1 if re.search(r"\b(?:who|which|whose)\b", question) else 5
+        quarters = self._question_quarters(question)
+
+        if GROWTH_PATTERN.search(question):
+            if len(quarters) >= 2:
+                first, second = quarters[:2]
+            elif quarters:
+                if quarters[0] == "q1":
+                    return "❌ Q1 is the first quarter, so there is no earlier quarter to measure growth from. Ask e.g. 'who grew fastest from Q1 to Q2'."
+                first, second = f"q{int(quarters[0][1:]) - 1}", quarters[0]
+            else:
+                first, second = f"q{self.current_max_quarter - 1}", f"q{self.current_max_quarter}"
+            ranked = aggregates.rank_growth(first, second, k, ascending)
+            title = f"{'Slowest' if ascending else 'Fastest'} growth from {first.upper()} to {second.upper()}"
+            if not ranked:
+                return f"❌ No data to compare {first.upper()} and {second.upper()}."
+            return f"{title}: " + ", ".join(f"{i}. {topic} ({change:+.2f}%)" for i, (topic, change) in enumerate(ranked, 1))
+
+        quarter = quarters[0] if quarters else None
+        label = quarter.upper() if quarter else "total"
+        ranked = aggregates.rank(quarter, k, ascending)
+        if not ranked:
+            return f"❌ No data to rank for '{label}'."
+        title = f"{'Bottom' if ascending else 'Top'} {len(ranked)} by {label}"
+        return f"{title}: " + ", ".join(f"{i}. {topic} ({format_currency(value)})" for i, (topic, value) in enumerate(ranked, 1))
+
+    def _total_named_topics(self, question):
+        # "total for a and b in q1": every part must name a different head.
+        topics = [self._side_topic(part) for part in JOIN_PATTERN.split(question)]
+        if len(topics) < 2 or not all(topics) or len(set(topics)) != len(topics):
+            return None
+
+        quarters = self._question_quarters(question)
+        quarter = quarters[0] if quarters else None
+        label = quarter.upper() if quarter else "total"
+        values = [self.sheet.store.aggregates.get(topic, quarter) for topic in topics]
+        for topic, value in zip(topics, values):
+            if value is None:
+                return f"❌ No data available for '{topic}' in '{label}'."
+        names = ", ".join(topics[:-1]) + f" and {topics[-1]}"
+        prefix = f"Total {quarter.upper()}" if quarter else "Total"
+        return f"{prefix} for {names} is {format_currency(sum(values))}."
+
+    def _total_topics(self, question):
+        quarters = self._question_quarters(question)
+        quarter = quarters[0] if quarters else None
+        total = self.sheet.store.aggregates.total(quarter)
+        if not total or not total[1]:
+            return f"❌ No data available for '{quarter.upper() if quarter else 'total'}'."
+        value, count = total
+        label = f"Total {quarter.upper()}" if quarter else "Total"
+        return f"{label} across {count} heads is {format_currency(value)}."
+
+    def _process_yesno(self, question, topic):
+        qtrs = self._extract_quarters(question)
+        if len(qtrs) >= 2:
+            val1, val2 = self.get_value(topic, qtrs[0]), self.get_value(topic, qtrs[1])
+            if val1 and val2:
+                val1, val2 = float(val1), float(val2)
+                increase = val2 > val1
+                direction = "increased" if increase else "decreased"
+                change = (val2 - val1) / val1 * 100
+                answer = "yes" if (
+                    ("increase" in question and increase) or 
+                    ("decrease" in question and not increase)
+                ) else "no"
+                return f"{topic} {direction} from {val1} to {val2} ({abs(change):.2f}%). Answer: {answer}"
+        return f"❌ Could not find {topic} data for required quarters."
+
+    def _process_growth(self, question, topic):
+        qtrs = self._extract_quarters(question)
+        if "past year" in question or "year over year" in question:
+            qtrs = [f"q{self.current_max_quarter - 1}", f"q{self.current_max_quarter}"]
+        if len(qtrs) >= 2:
+            val1, val2 = self.get_value(topic, qtrs[0]), self.get_value(topic, qtrs[1])
+            if val1 and val2:
+                val1, val2 = float(val1), float(val2)
+                change = (val2 - val1) / val1 * 100
+                direction = "increased" if change > 0 else "decreased"
+                return f"{topic} {direction} by {abs(change):.2f}% from {qtrs[0]} to {qtrs[1]}"
+        return f"❌ Could not compute growth for {topic}."
+
+    def _process_comparison(self, question, topic):
+        qtrs = self._extract_quarters(question)
+        if len(qtrs) >= 2:
+            val1 = self.get_value(topic, qtrs[0])
+            val2 = self.get_value(topic, qtrs[1])
+
+            logger.debug("%s - %s: %s, %s: %s", topic, qtrs[0], val1, qtrs[1], val2)
+
+            try:
+                val1 = float(val1)
+                val2 = float(val2)
+                change = (val2 - val1) / val1 * 100
+                direction = "Increase" if change >= 0 else "Decrease"
+                return f"{topic} changed from {val1} ({qtrs[0]}) to {val2} ({qtrs[1]}). {direction} of {abs(change):.2f}%"
+            except (TypeError, ValueError):
+                return f"❌ Could not compare values for {topic} — invalid or missing numbers in {qtrs[0]} or {qtrs[1]}."
+
+        return f"❌ Could not compare values for {topic}."
+
+
+    def predict_future(self, topic, question):
+        return self._predict_many(topic, [question])[0]
+
+    def _predict_many(self, topic, questions):
+        future_quarters = []
+        for question in questions:
+            match = re.search(r"q(\d+)", question.lower())
+            if match:
+                future_quarters.append(f"q{match.group(1)}")
+            else:
+                future_quarters.append(f"q{self.current_max_quarter + 1}")
+
+        with self.stage_timer.span("predict"):
+            entry = self.predictor.get(topic)
+        if entry is None:
+            return [f"❌ No model available for {topic}."] * len(questions)
+
+        # forecast[i] is the forecast for quarter i + 1.
+        forecast, best_model = entry
+        quarter_num = {f"q{i}": i for i in range(1, len(forecast) + 1)}
+
+        answers = [f"❌ Unsupported quarter: {q.upper()}." for q in future_quarters]
+        supported = [i for i, q in enumerate(future_quarters) if quarter_num.get(q)]
+        if not supported:
+            return answers
+
+        preds = [float(forecast[quarter_num[future_quarters[i]] - 1]) for i in supported]
+
+        model_name = {
+            "linear_regression": "Linear Regression",
+            "random_forest": "Random Forest",
+            "average_growth": "Average Growth"
+        }.get(best_model, best_model)
+
+        for i, pred in zip(supported, preds):
+            answers[i] = f"{topic.title()}'s {future_quarters[i].upper()} predicted revenue is {format_currency(pred)} (using {model_name})."
+        return answers
+
+
+
+    def answer_query(self, question):
+        self.stage_timer.begin()
+        try:
+            with self._pinned():
+                with self.stage_timer.span("parse"):
+                    question = convert_natural_quarter_phrasing(question, current_max_quarter=self.current_max_quarter)
+                # Every later stage lowercases the question first, so this key is exact.
+                key = question.strip().lower()
+                version = self.data_version
+                answer = self.answer_cache.get(key, version)
+                if answer is None:
+                    answer = self._answer_converted(question)
+                    self.answer_cache.put(key, answer, version)
+                return answer
+        finally:
+            self.stage_timer.end()
+
+    def _resolve_year_quarters(self, question_lower):
+        store = self.sheet.store
+        question_lower, unknown = store.resolve_year_quarters(question_lower)
+        if unknown is None:
+            return question_lower, None
+        (first_year, first_q), (last_year, last_q) = min(store.year_quarters), max(store.year_quarters)
+        return question_lower, (
+            f"❌ {unknown.upper()} is not a quarter in the sheet, which covers "
+            f"{first_year} Q{first_q} to {last_year} Q{last_q}."
+        )
+
+    def _answer_converted(self, question):
+        question, error = self._resolve_year_quarters(question.lower())
+        if error:
+            return error
+        complex_response = self.handle_complex_query(question)
+        if complex_response is not None:
+            return complex_response
+
+        topic, quarter = self.parse_question(question)
+        if topic and quarter:
+            value = self.get_value(topic, quarter)
+            if value:
+                return f"{topic} in {quarter.upper()} is {value}."
+            else:
+                return f"❌ No data available for '{topic}' in '{quarter.upper()}'." 
+
+        if not topic:
+            return "❌ Could not identify a valid topic in your question."
+        if not quarter:
+            extracted = self._extract_answers([question.lower()], [topic])[0]
+            return extracted or "❌ Could not identify a valid quarter or time period."
+
+        return "❌ Could not understand your query. Please rephrase."
+
+    def answer_many(self, questions, batch_size=256, with_parse=False):
+        # Streams answers in input order; only batch_size questions are held
+        # in memory at a time, so questions may be any (lazy) iterable. With
+        # with_parse, yields (answer, topic, quarter) from the parse that
+        # answered the question.
+        questions = iter(questions)
+        while True:
+            batch = list(islice(questions, batch_size))
+            if not batch:
+                return
+            parses = [None] * len(batch) if with_parse else None
+            # Each batch is answered from one sheet; the pin is released
+            # before yielding, so a reload between batches is picked up.
+            with self._pinned():
+                answers = self._answer_batch(batch, parses)
+            if with_parse:
+                yield from ((answer, topic, quarter) for answer, (topic, quarter) in zip(answers, parses))
+            else:
+                yield from answers
+
+    def _answer_batch(self, batch, parses=None):
+        version = self.data_version
+        max_quarter = self.current_max_quarter
+        keys = [convert_natural_quarter_phrasing(q, current_max_quarter=max_quarter).strip().lower() for q in batch]
+        answers = [self.answer_cache.get(key, version) for key in keys]
+        # Repeated questions within a batch are answered once.
+        missing = defaultdict(list)
+        for i, answer in enumerate(answers):
+            if answer is None:
+                missing[keys[i]].append(i)
+        missing_parses = [None] * len(missing) if parses is not None else None
+        answered = self._answer_converted_batch(list(missing), missing_parses)
+        for j, ((key, indices), answer) in enumerate(zip(missing.items(), answered)):
+            for i in indices:
+                answers[i] = answer
+                if parses is not None:
+                    parses[i] = missing_parses[j]
+            self.answer_cache.put(key, answer, version)
+        if parses is not None:
+            # Cached answers were never parsed in this batch.
+            for i, key in enumerate(keys):
+                if parses[i] is None:
+                    parses[i] = self._parse(key)
+        return answers
+
+    def _answer_converted_batch(self, batch, parses=None):
+        answers = [None] * len(batch)
+        lookups = defaultdict(list)
+        forecasts = defaultdict(list)
+        free_form = []
+
+        for i, question_lower in enumerate(batch):
+            question_lower, error = self._resolve_year_quarters(question_lower)
+            if error:
+                answers[i] = error
+                if parses is not None:
+                    parses[i] = (None, None)
+                continue
+            topic, quarter = self.parse_question(question_lower)
+            if parses is not None:
+                parses[i] = (topic, quarter)
+            aggregate = self._process_aggregate(question_lower, topic)
+            if aggregate is not None:
+                answers[i] = aggregate
+                continue
+            if not topic:
+                answers[i] = "❌ Could not identify the topic."
+                continue
+
+            intent = self._intent(question_lower)
+            if intent == "forecast":
+                forecasts[topic].append((i, question_lower))
+            elif intent == "yesno":
+                answers[i] = self._process_yesno(question_lower, topic)
+            elif intent == "growth":
+                answers[i] = self._process_growth(question_lower, topic)
+            elif intent == "comparison":
+                answers[i] = self._process_comparison(question_lower, topic)
+            elif not quarter:
+                free_form.append((i, question_lower, topic))
+            else:
+                lookups[quarter].append((i, topic))
+
+        for topic, items in forecasts.items():
+            preds = self._predict_many(topic, [q for _, q in items])
+            for (i, _), answer in zip(items, preds):
+                answers[i] = answer
+
+        extracted = self._extract_answers([q for _, q, _ in free_form], [t for _, _, t in free_form])
+        for (i, _, _), answer in zip(free_form, extracted):
+            answers[i] = answer or "❌ Could not identify a valid quarter or time period."
+
+        store = self.sheet.store
+        for quarter, items in lookups.items():
+            column = store.column(quarter)
+            rows = np.array([store.topic_index.get(topic, -1) for _, topic in items])
+            values = column[rows] if column is not None else np.full(len(items), np.nan)
+            for (i, topic), row, value in zip(items, rows, values):
+                if row >= 0 and not np.isnan(value) and value:
+                    answers[i] = f"{topic} in {quarter.upper()} is {value}."
+                else:
+                    answers[i] = f"❌ No data available for '{topic}' in '{quarter.upper()}'."
+
+        return answers
+
@@ -0,0 +1,97 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from loader import prune_cache, touch
+
+
+def quarter_sentences(df, topic_column):
+    # One short context per topic/column cell, grouped by topic so each
+    # topic owns a contiguous id range in the index.
+    sentences = []
+    ranges = {}
+    columns = [col for col in df.columns if col != topic_column]
+    for topic, group in df.groupby(topic_column, sort=False, observed=True):
+        row = group.iloc[0]
+        start = len(sentences)
+        for col in columns:
+            value = pd.to_numeric(row[col], errors="coerce")
+            if pd.notna(value):
+                sentences.append(f"The value of {topic} in {col.upper()} is {value}.")
+        ranges[topic] = (start, len(sentences))
+    return sentences, ranges
+
+
+class ContextIndex:
+    # Embeds every topic/quarter sentence once and keeps them in a FAISS
+    # inner-product index (embeddings are normalized, so scores are cosine
+    # similarities). The index is persisted next to a key derived from the
+    # CSV content and the embedding model. Given the index of a previous
+    # version of the sheet, its encoder is reused and only sentences it did
+    # not have are embedded.
+    def __init__(self, df, topic_column, csv_digest, model_name, cache_dir=None, keep=2, previous=None):
+        import faiss
+
+        self._faiss = faiss
+        self.model_name = model_name
+        if previous is not None and previous.model_name != model_name:
+            previous = None
+        if previous is not None:
+            self.encoder = previous.encoder
+        else:
+            from sentence_transformers import SentenceTransformer
+
+            self.encoder = SentenceTransformer(model_name)
+        self.sentences, self.ranges = quarter_sentences(df, topic_column)
+
+        key = hashlib.sha256((csv_digest + model_name).encode()).hexdigest()[:16]
+        index_path = os.path.join(cache_dir, f"{key}.faiss") if cache_dir else None
+        if index_path and os.path.exists(index_path):
+            self.index = faiss.read_index(index_path)
+            touch(index_path)
+        else:
+            self.index = self._build(previous)
+            if index_path:
+                os.makedirs(cache_dir, exist_ok=True)
+                faiss.write_index(self.index, f"{index_path}.tmp")
+                os.replace(f"{index_path}.tmp", index_path)
+                prune_cache(cache_dir, r"[0-9a-f]{16}\.faiss", keep)
+
+    def _encode(self, texts):
+        vectors = self.encoder.encode(list(texts), batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def _build(self, previous=None):
+        known = {}
+        if previous is not None and previous.index.ntotal:
+            known = dict(zip(previous.sentences, previous.index.reconstruct_n(0, previous.index.ntotal)))
+        vectors = np.zeros((len(self.sentences), self.encoder.get_sentence_embedding_dimension()), dtype=np.float32)
+        missing = []
+        for i, sentence in enumerate(self.sentences):
+            if sentence in known:
+                vectors[i] = known[sentence]
+            else:
+                missing.append(i)
+        if missing:
+            vectors[missing] = self._encode([self.sentences[i] for i in missing])
+        index = self._faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        return index
+
+    def search(self, questions, topics, k=3):
+        vectors = self._encode(questions)
+        results = []
+        for vector, topic in zip(vectors, topics):
+            start, end = self.ranges.get(topic, (0, 0))
+            if start == end:
+                results.append([])
+                continue
+            params = self._faiss.SearchParameters(sel=self._faiss.IDSelectorRange(start, end))
+            scores, ids = self.index.search(vector[None, :], min(k, end - start), params=params)
+            results.append([(self.sentences[i], float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0])
+        return results
+
+    def contexts(self, questions, topics, k=3):
+        return [" ".join(sentence for sentence, _ in hits) for hits in self.search(questions, topics, k)]
@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from qa_pipeline import FinancialQASystem
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ServerMetrics:
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.questions = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+
+    def snapshot(self):
+        latencies = np.asarray(self.latencies) * 1000
+        uptime = time.monotonic() - self.started
+        return {
+            "pid": os.getpid(),
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "questions": self.questions,
+            "batches": self.batches,
+            "throughput_qps": self.questions / uptime if uptime else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+        }
+
+
+class QAServer:
+    # One shared FinancialQASystem. Questions from concurrent requests are
+    # queued and micro-batched into answer_many calls that run on a worker
+    # pool, so CPU-bound forecasting and QA inference never block the loop.
+    def __init__(self, qa=None, workers=4, max_batch=64, max_wait_ms=5):
+        self.qa = qa or FinancialQASystem()
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qa-worker")
+        self.metrics = ServerMetrics()
+        self._queue = None
+        self._batcher = None
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=8000, sock=None):
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        if sock is not None:
+            self._server = await asyncio.start_server(self._handle_connection, sock=sock)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def answer(self, questions):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for question in questions:
+            future = loop.create_future()
+            await self._queue.put((question, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._run_batch(batch))
+
+    def _answer_batch(self, questions):
+        # (answer, error) per question. When the batch raises, its questions
+        # are retried one at a time, so one bad question only fails its own
+        # request and not every request that shared the batch.
+        try:
+            return [(answer, None) for answer in self.qa.answer_many(questions)]
+        except Exception:
+            results = []
+            for question in questions:
+                try:
+                    results.append((self.qa.answer_query(question), None))
+                except Exception as e:
+                    results.append((None, e))
+            return results
+
+    async def _run_batch(self, batch):
+        questions = [question for question, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self._answer_batch, questions)
+        except Exception as e:
+            results = [(None, e)] * len(batch)
+
+        self.metrics.batches += 1
+        self.metrics.batch_sizes.append(len(batch))
+        for (_, future), (answer, error) in zip(batch, results):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(answer)
+
+    async def handle(self, method, path, body):
+        try:
+            return await self._route(method, path, body)
+        except Exception as e:
+            traceback.print_exc()
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, dict(
+                self.metrics.snapshot(), answer_cache=self.qa.answer_cache.stats(), stages=self.qa.stage_stats()
+            )
+        if path != "/answer":
+            return 404, {"error": f"unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "body must be JSON"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "body must be a JSON object"}
+        single = "question" in payload
+        questions = [payload["question"]] if single else payload.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+            return 400, {"error": "expected {\"question\": str} or {\"questions\": [str, ...]}"}
+
+        start = time.monotonic()
+        answers = await self.answer(questions)
+        self.metrics.requests += 1
+        self.metrics.questions += len(questions)
+        self.metrics.latencies.append(time.monotonic() - start)
+        return 200, {"answer": answers[0]} if single else {"answers": answers}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, response = await self.handle(method, path.split("?", 1)[0], body)
+                data = json.dumps(response).encode()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class InProcessClient:
+    # Minimal HTTP/1.1 JSON client for talking to a QAServer in the same
+    # event loop, e.g. from tests.
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+
+    async def request(self, method, path, payload=None):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        data = await reader.readexactly(length)
+        writer.close()
+        return status, json.loads(data)
+
+
+async def serve(host, port, workers, max_batch, max_wait_ms, qa=None, sock=None):
+    server = QAServer(qa, workers=workers, max_batch=max_batch, max_wait_ms=max_wait_ms)
+    host, port = await server.start(host, port, sock=sock)
+    if sock is None:
+        print(f"Serving Q&A on http://{host}:{port} — POST /answer, GET /metrics", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def prefork(processes, host, port, workers, max_batch, max_wait_ms):
+    # The parent loads the CSV, fits the closed-form models and loads the QA
+    # model once, then forks workers that share that state copy-on-write and
+    # accept on one listening socket. Workers only answer queries.
+    qa = FinancialQASystem()
+    qa.preload()
+    sock = socket.create_server((host, port))
+    host, port = sock.getsockname()[:2]
+    # Keep the cyclic GC from touching (and so copying) inherited objects.
+    gc.freeze()
+    print(f"Serving Q&A on http://{host}:{port} with {processes} processes — POST /answer, GET /metrics", flush=True)
+
+    pids = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                if "torch" in sys.modules:
+                    sys.modules["torch"].set_num_threads(max(1, (os.cpu_count() or 1) // processes))
+                qa.watch_csv()
+                asyncio.run(serve(host, port, workers, max_batch, max_wait_ms, qa=qa, sock=sock))
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        pids.append(pid)
+
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent JSON Q&A server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=1, help="pre-fork this many worker processes")
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+    if args.processes > 1:
+        if not hasattr(os, "fork"):
+            parser.error("--processes needs a platform with os.fork")
+        prefork(args.processes, args.host, args.port, args.workers, args.max_batch, args.max_wait_ms)
+        return
+    qa = FinancialQASystem()
+    qa.watch_csv()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms, qa=qa))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
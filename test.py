@@ -1,60 +1,571 @@
-import pytest
-from qa_pipeline import FinancialQASystem
-
-qa = FinancialQASystem()
-
-# --- BASIC FACTUAL LOOKUP TESTS ---
-
-def test_basic_lookup():
-    result = qa.answer_query("What is the value of Ashish in Q1?")
-    assert "ashish in q1" in result.lower(), f"Unexpected result: {result}"
-
-def test_alias_lookup():
-    result = qa.answer_query("What is the value of udit in Q1?")
-    assert "udit agrawal in q1" in result.lower(), f"Unexpected result: {result}"
-
-def test_sum_lookup():
-    result = qa.answer_query("What is the total revenue for Kaustubh A. Varde?")
-    assert ("kaustubh a.varde in sum value" in result.lower() or 
-            "no data" not in result.lower()), f"Unexpected result: {result}"
-
-# --- GROWTH / COMPARISON TESTS ---
-
-def test_percentage_growth():
-    result = qa.answer_query("What was the percentage change in Faizan Ali Khan from Q1 to Q2?")
-    assert "%" in result, f"Expected percentage in result: {result}"
-
-def test_yes_no_growth():
-    result = qa.answer_query("Did Gaurav Dharane increase from Q2 to Q3?")
-    assert "yes" in result.lower() or "no" in result.lower(), f"Unexpected result: {result}"
-
-def test_growth_direction():
-    result = qa.answer_query("How much did Ashish's revenue change from Q3 to Q4?")
-    assert "increased" in result.lower() or "decreased" in result.lower(), f"Unexpected result: {result}"
-
-# --- PREDICTION TESTS ---
-
-def test_predict_q5():
-    result = qa.answer_query("Predict next year's q1 revenue for Ashish")
-    assert "predicted" in result.lower() and "ashish" in result.lower(), f"Unexpected result: {result}"
-
-def test_predict_q6():
-    result = qa.answer_query("What is the estimated revenue for Faizan in the following quarter?")
-    assert "predicted" in result.lower() and "faizan" in result.lower(), f"Unexpected result: {result}"
-
-# --- EDGE CASES ---
-
-def test_unknown_topic():
-    result = qa.answer_query("What is the value of Ramesh in Q1?")
-    assert ("could not identify" in result.lower() or 
-            "no data" in result.lower()), f"Unexpected result: {result}"
-
-def test_missing_quarter():
-    result = qa.answer_query("How much did Ashish make?")
-    assert any(key in result.lower() for key in [
-        "could not identify", "no data", "could not find"
-    ]), f"Unexpected result: {result}"
-
-def test_ambiguous_question():
-    result = qa.answer_query("How is business?")
-    assert "could not identify" in result.lower(), f"Unexpected result: {result}"
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from config import MODEL_CONFIG
+from qa_pipeline import FinancialQASystem, LookupStore, QUESTION_MATCHER, format_currency
+from ml_predictor import (
+    MODEL_NAMES, ClosedFormModels, ForecastCache, ModelRegistry, expected_forest_weights, fit_closed_form,
+    fit_random_forest, select_models, train_all_models_and_rank
+)
+from loader import file_digest, load_csv, quarter_columns
+from matcher import FuzzyTopicIndex
+from answer_cache import AnswerCache
+from retrieval import quarter_sentences
+from server import InProcessClient, QAServer
+from benchmark import question_corpus
+from dataset_builder import build_dataset
+from main import run_batch
+
+# On-disk caches go to a temporary directory per run, not the working tree.
+CACHE_DIR = tempfile.TemporaryDirectory()
+MODEL_CONFIG.update({
+    name: os.path.join(CACHE_DIR.name, name) for name in ["data_cache_dir", "forecast_cache_dir", "retrieval_cache_dir"]
+})
+
+qa = FinancialQASystem()
+
+# --- LOADER TESTS ---
+
+def test_load_csv_streams_typed_chunks(tmp_path):
+    df = load_csv("Business Heads.csv", lowercase_columns=True, chunksize=4, cache_dir=tmp_path)
+    assert str(df["business head"].dtype) == "category" and df["q1"].dtype == np.float64
+    assert df["business head"].tolist()[:2] == ["ashish", "faizan ali khan"] and len(df) == 13
+
+    pytest.importorskip("pyarrow")
+    assert len(list(tmp_path.glob("*.parquet"))) == 1
+    cached = load_csv("Business Heads.csv", lowercase_columns=True, chunksize=4, cache_dir=tmp_path)
+    assert cached.equals(df)
+    cached, digest = load_csv("Business Heads.csv", lowercase_columns=True, cache_dir=tmp_path, return_digest=True)
+    assert cached.equals(df) and digest == file_digest("Business Heads.csv") == qa.sheet.digest
+
+def test_build_dataset_streams_squad_json_lines(tmp_path):
+    output = tmp_path / "squad.jsonl"
+    count = build_dataset("Business Heads.csv", str(output), shard_rows=5)
+    lines = output.read_text().splitlines()
+    assert count == len(lines) == 110
+    for i, line in enumerate(lines):
+        example = json.loads(line)
+        text, start = example["answers"]["text"][0], example["answers"]["answer_start"][0]
+        assert example["id"] == f"q_{i}" and example["context"][start:start + len(text)] == text
+    assert json.loads(lines[0])["question"] == "What is the value of ashish in Q1?"
+
+# --- BASIC FACTUAL LOOKUP TESTS ---
+
+def test_basic_lookup():
+    result = qa.answer_query("What is the value of Ashish in Q1?")
+    assert "ashish in q1" in result.lower(), f"Unexpected result: {result}"
+
+def test_alias_lookup():
+    result = qa.answer_query("What is the value of udit in Q1?")
+    assert "udit agrawal in q1" in result.lower(), f"Unexpected result: {result}"
+
+def test_sum_lookup():
+    result = qa.answer_query("What is the total revenue for Kaustubh A. Varde?")
+    assert ("kaustubh a.varde in sum value" in result.lower() or 
+            "no data" not in result.lower()), f"Unexpected result: {result}"
+
+def test_get_value_matches_dataframe():
+    row = qa.df[qa.df[qa.topic_column] == "ashish"]
+    assert qa.get_value("Ashish", "q2") == row["q2"].values[0]
+
+def test_get_value_missing():
+    assert qa.get_value("ramesh", "q1") is None
+    assert qa.get_value("ashish", "q9") is None
+
+def test_question_matcher_single_pass():
+    topic, quarters = QUESTION_MATCHER.scan("did faizan grow from the first quarter to q3?")
+    assert topic == "faizan ali khan" and quarters == ("q1", "q3")
+
+def test_fuzzy_index_narrows_candidates():
+    topics = [f"branch {i:03d}" for i in range(200)] + ["faizan ali khan"]
+    index = FuzzyTopicIndex(topics, max_candidates=5)
+    candidates = index.candidates("revenue of faizn ali khan")
+    assert "faizan ali khan" in candidates and len(candidates) <= 5
+    assert index.resolve("revenue of faizn ali khan") == "faizan ali khan"
+
+# --- GROWTH / COMPARISON TESTS ---
+
+def test_percentage_growth():
+    result = qa.answer_query("What was the percentage change in Faizan Ali Khan from Q1 to Q2?")
+    assert "%" in result, f"Expected percentage in result: {result}"
+
+def test_yes_no_growth():
+    result = qa.answer_query("Did Gaurav Dharane increase from Q2 to Q3?")
+    assert "yes" in result.lower() or "no" in result.lower(), f"Unexpected result: {result}"
+
+def test_growth_direction():
+    result = qa.answer_query("How much did Ashish's revenue change from Q3 to Q4?")
+    assert "increased" in result.lower() or "decreased" in result.lower(), f"Unexpected result: {result}"
+
+def test_comparison_logs_values_at_debug_level(caplog, capsys):
+    with caplog.at_level("DEBUG", logger="qa_pipeline"):
+        qa.answer_query("Compare Nitesh Jain in Q1 vs Q3")
+    assert "nitesh jain - q1" in caplog.text
+    assert "[DEBUG]" not in capsys.readouterr().out
+
+def test_model_load_failure_is_logged_not_printed(tmp_path, caplog, capsys):
+    system = FinancialQASystem(model_path=str(tmp_path / "missing"))
+    system.qa_mode = "full"
+    with caplog.at_level("WARNING", logger="qa_pipeline"):
+        system.answer_query("How is Ashish doing?")
+    assert "Could not load QA model" in caplog.text
+    assert "Could not load QA model" not in capsys.readouterr().out
+
+# --- CROSS-TOPIC TESTS ---
+
+def test_top_heads_by_quarter():
+    expected = qa.df.dropna(subset=["q3"]).nlargest(3, "q3")["business head"].tolist()
+    result = qa.answer_query("Top 3 heads by Q3 revenue")
+    assert result.startswith("Top 3 by Q3: 1. " + expected[0])
+    assert [result.index(topic) for topic in expected] == sorted(result.index(topic) for topic in expected)
+
+def test_fastest_growth_and_totals():
+    change = (qa.df["q3"] - qa.df["q2"]) / qa.df["q2"] * 100
+    fastest = qa.df.loc[change.idxmax(), "business head"]
+    assert qa.answer_query("Who grew fastest from Q2 to Q3?") == f"Fastest growth from Q2 to Q3: 1. {fastest} (+{change.max():.2f}%)"
+    assert format_currency(qa.df["q4"].sum()) in qa.answer_query("Total Q4 across all heads")
+    assert "no earlier quarter" in qa.answer_query("Who grew fastest in Q1?")
+
+def test_compare_two_heads():
+    result = qa.answer_query("Compare Ashish vs Faizan in Q2")
+    assert result.startswith("In Q2, ashish") and "faizan ali khan" in result
+    assert "q1" in qa.answer_query("Compare Ashish in Q1 vs Q3")
+
+def test_named_head_without_alias_is_not_ranked(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4,Sum Value\nJane Smith,100,200,300,400,1000\nJohn Doe,500,600,700,850,2650\nMary Major,400,500,600,700,2200\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    assert system.answer_query("What is the overall total for Mary Major?") == "mary major in SUM VALUE is 2200.0."
+    assert not system.answer_query("Which quarter was highest for Jane Smith?").startswith("Top")
+    assert system.answer_query("Who is the top head by Q4?") == "Top 1 by Q4: 1. john doe (Rs 850)"
+
+def test_total_for_two_heads_is_combined():
+    expected = format_currency(qa.get_value("ashish", "q1") + qa.get_value("faizan ali khan", "q1"))
+    assert qa.answer_query("What is the total for Ashish and Faizan in Q1?") == f"Total Q1 for ashish and faizan ali khan is {expected}."
+    assert qa.answer_query("Compare Ashish and Faizan in Q2").startswith("In Q2, ashish")
+
+def test_blank_topic_total_row_is_not_a_head(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4,Sum Value\nJane Smith,100,200,300,400,1000\nJohn Doe,500,600,700,850,2650\n,,,,,3650\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    assert system.answer_query("Who are the top 3 heads by total revenue?") == "Top 2 by total: 1. john doe (Rs 2,650), 2. jane smith (Rs 1,000)"
+    assert system.answer_query("Total across all heads") == "Total across 2 heads is Rs 3,650."
+
+# --- PREDICTION TESTS ---
+
+def test_predict_q5():
+    result = qa.answer_query("Predict next year's q1 revenue for Ashish")
+    assert "predicted" in result.lower() and "ashish" in result.lower(), f"Unexpected result: {result}"
+
+def test_predict_q6():
+    result = qa.answer_query("What is the estimated revenue for Faizan in the following quarter?")
+    assert "predicted" in result.lower() and "faizan" in result.lower(), f"Unexpected result: {result}"
+
+def test_models_fitted_on_demand():
+    # qa's own table is persisted, so a fresh one shows the on-demand fill.
+    registry = ModelRegistry(qa.df)
+    assert not registry.is_fitted("robin gupta")
+    assert registry.get("robin gupta") is not None and registry.is_fitted("robin gupta")
+    result = qa.answer_query("Forecast Robin's revenue for Q6")
+    assert "predicted" in result.lower(), f"Unexpected result: {result}"
+    assert qa.predictor.is_fitted("robin gupta")
+
+def test_forecast_table_replaces_estimators():
+    registry = ModelRegistry(qa.df, horizon=24)
+    assert registry.table.values.shape == (len(qa.df), 24) and registry.table.values.dtype == np.float32
+    forecast, best_model = registry.get("ashish")
+    assert registry.is_fitted("ashish") and len(forecast) == 24
+    assert best_model in {"linear_regression", "random_forest"}
+
+    table, best_models = train_all_models_and_rank(qa.df.head(3), horizon=8)
+    assert table.values.shape == (3, 8) and len(best_models) == 3
+
+def test_closed_form_fit_matches_least_squares():
+    Y = np.array([[100.0, 120.0, np.nan, 150.0], [5.0, np.nan, np.nan, np.nan]])
+    fit = fit_closed_form(Y)
+    slope, intercept = np.polyfit([1, 2, 3], [100.0, 120.0, 150.0], 1)
+    assert np.isclose(fit["slope"][0], slope) and np.isclose(fit["intercept"][0], intercept)
+    assert fit["rf_selectable"][0]
+    assert not fit["valid"][1]
+
+def test_walk_forward_selection():
+    Y = np.array([[100, 110, 125, 130, 145, 150], [100, 10, 12, 11, 10, 12], [10, 20, 40, 45, 50, np.nan]], dtype=float)
+    best = select_models(Y, fit_closed_form(Y))
+    assert [MODEL_NAMES[code] for code in best] == ["linear_regression", "random_forest", "average_growth"]
+    assert np.isclose(expected_forest_weights(4).sum(), 1.0)
+
+    df = pd.DataFrame(Y, columns=["q1", "q2", "q3", "q4", "q5", "q6"])
+    df.insert(0, "business head", ["a", "b", "c"])
+    forecast, best_model = ModelRegistry(df, horizon=8).get("c")
+    assert best_model == "average_growth" and forecast[5] == 60.0
+
+    report = ClosedFormModels.from_frame(df).backtest()
+    assert report["topics"] == 3 and report["forecasts"] == 11
+    assert sum(m["wins"] for m in report["models"].values()) == 3
+
+def test_random_forest_is_seeded():
+    values = [10.0, 14.0, 13.0, 19.0, 22.0]
+    first, second = fit_random_forest(values), fit_random_forest(values)
+    assert (first.predict([[6], [7]]) == second.predict([[6], [7]])).all()
+
+
+def test_forecast_cache_reuses_unchanged_topics(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nA,10,30,20,40\nB,5,9,4,12\n")
+    df = load_csv(csv_path)
+    df.columns = [col.lower() for col in df.columns]
+
+    first = ModelRegistry(df, cache=ForecastCache(tmp_path / "cache", file_digest(csv_path)), mmap_table=True)
+    forecast_a = first.get("a")[0].copy()
+    first.get("b")
+
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nA,10,30,20,40\nB,6,9,4,12\n")
+    df = load_csv(csv_path)
+    df.columns = [col.lower() for col in df.columns]
+    second = ModelRegistry(df, cache=ForecastCache(tmp_path / "cache", file_digest(csv_path)), mmap_table=True)
+    assert second.closed_form.fit["slope"][1] != first.closed_form.fit["slope"][1]
+    assert np.array_equal(second.get("a")[0], forecast_a)
+    second.get("b")
+
+    third = ModelRegistry(df, cache=ForecastCache(tmp_path / "cache", file_digest(csv_path)), mmap_table=True)
+    assert isinstance(third.closed_form.Y, np.memmap) and isinstance(third.table.values, np.memmap)
+    assert third.is_fitted("a") and third.is_fitted("b")
+
+def test_forecast_cache_topic_files_are_plain_arrays(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nA,10,30,20,40\n")
+    df = load_csv(csv_path)
+    df.columns = [col.lower() for col in df.columns]
+    cache = ForecastCache(tmp_path / "cache", file_digest(csv_path))
+    closed_form = ClosedFormModels.from_frame(df, "business head")
+
+    cache.save_topic(closed_form, "a", 3, ("random_forest", np.array([41.0, 42.0, 43.0])))
+    best_model, forecast = cache.load_topic(closed_form, "a", 3)
+    assert best_model == "random_forest" and forecast.tolist() == [41.0, 42.0, 43.0]
+    path = cache._topic_file(closed_form, "a", 3)
+    assert path.endswith(".npy") and np.load(path, allow_pickle=False).tolist() == [2.0, 41.0, 42.0, 43.0]
+
+    np.save(path, np.array([("random_forest", [1.0])], dtype=object), allow_pickle=True)
+    assert cache.load_topic(closed_form, "a", 3) is None
+
+
+def test_caches_keep_only_recent_versions(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    for i in range(4):
+        csv_path.write_text(f"Business Head,Q1,Q2,Q3,Q4\nA,{10 + i},30,20,40\nB,5,9,4,12\n")
+        df = load_csv(csv_path, lowercase_columns=True, cache_dir=tmp_path / "data")
+        ModelRegistry(df, cache=ForecastCache(tmp_path / "forecasts", file_digest(csv_path), keep=2)).get("a")
+    assert len(list((tmp_path / "data").glob("*.parquet"))) == MODEL_CONFIG["cache_keep_versions"]
+    assert len([p for p in (tmp_path / "forecasts").iterdir() if p.name != "topics"]) == 2
+    assert len(list((tmp_path / "forecasts" / "topics").glob("*.npy"))) <= 4
+
+# --- BATCH TESTS ---
+
+def test_answer_many_matches_answer_query():
+    questions = [
+        "What is the value of Ashish in Q1?",
+        "Did Gaurav Dharane increase from Q2 to Q3?",
+        "Forecast Robin's revenue for Q6",
+        "Forecast Robin's revenue for Q7",
+        "What is the value of Ramesh in Q1?",
+        "What is the value of udit in Q1?",
+    ]
+    answers = qa.answer_many((q for q in questions), batch_size=4)
+    assert list(answers) == [qa.answer_query(q) for q in questions]
+
+# --- ANSWER CACHE TESTS ---
+
+def test_answer_cache_hit():
+    first = qa.answer_query("What is the value of Shariq in Q2?")
+    hits = qa.answer_cache.hits
+    assert qa.answer_query("  what is the value of SHARIQ in q2?") == first
+    assert qa.answer_cache.hits == hits + 1
+
+def test_answer_cache_eviction_and_versions():
+    cache = AnswerCache(max_size=2)
+    for key in ["a", "b", "c"]:
+        cache.put(key, key.upper(), version=0)
+    assert cache.get("a", 0) is None and cache.get("c", 0) == "C"
+    assert cache.get("c", 1) is None
+    assert cache.stats()["evictions"] == 1
+
+# --- MULTI-YEAR TESTS ---
+
+def test_quarter_columns_orders_year_quarters():
+    columns = ["business head", "2024 q1", "q4-23", "fy2023 q3", "sum value"]
+    assert quarter_columns(columns) == [("fy2023 q3", 1), ("q4-23", 2), ("2024 q1", 3)]
+    assert quarter_columns(["q10", "q2", "q1"]) == [("q1", 1), ("q2", 2), ("q10", 10)]
+
+def test_multi_year_sheet(tmp_path):
+    header = ",".join(f"{year} Q{q}" for year in (2023, 2024) for q in range(1, 5))
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text(f"Business Head,{header}\nAshish,1,2,3,4,5,6,7,8\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    assert system.current_max_quarter == 8
+    assert system.get_value("ashish", "q6") == 6.0
+    assert "Q9 predicted revenue is Rs 9" in system.answer_query("Forecast Ashish's revenue next quarter")
+
+def test_year_quarter_questions_read_the_named_column(tmp_path):
+    header = "2023 Q1,2023 Q2,2023 Q3,2023 Q4,2024 Q1,2024 Q2"
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text(f"Business Head,{header}\nAshish,1,2,3,4,5,6\nSuhail,10,20,30,40,50,65\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    assert system.answer_query("What is the value of Ashish in 2024 Q1?") == "ashish in Q5 is 5.0."
+    assert system.answer_query("What is Ashish in Q2 FY24?") == "ashish in Q6 is 6.0."
+    assert "from 40.0 to 65.0" in system.answer_query("Did Suhail increase from 2023 Q4 to 2024 Q2?")
+    assert system.answer_query("Top 1 heads by 2024 Q2") == "Top 1 by Q6: 1. suhail (Rs 65)"
+    assert system.answer_query("What is the value of Ashish in 2025 Q1?").startswith("❌ 2025 Q1 is not a quarter in the sheet")
+
+def test_startup_progress_reports_every_step():
+    steps = []
+    FinancialQASystem(progress=lambda step, total, message: steps.append((step, total, message)))
+    assert [step for step, _, _ in steps] == [0, 1, 2, 3]
+    assert steps[-1] == (3, 4, "Ready")
+
+# --- RELOAD TESTS ---
+
+def test_reload_refits_only_changed_topics(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,10,30,20,40\nSuhail,5,9,4,12\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    system.predictor.get("ashish")
+    system.predictor.get("suhail")
+    assert "10.0" in system.answer_query("What is the value of Ashish in Q1?")
+
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,11,30,20,40\nSuhail,5,9,4,12\n")
+    assert system.reload(force=True) == {"ashish"}
+    assert "11.0" in system.answer_query("What is the value of Ashish in Q1?")
+    assert system.predictor.is_fitted("suhail")
+
+def test_reload_mid_query_keeps_the_pinned_sheet(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,10,30,20,40\nSuhail,5,9,4,12\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    predictor = system.predictor
+    with system._pinned():
+        csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,11,30,20,40\nSuhail,5,9,4,12\n")
+        system.reload(force=True)
+        assert system.get_value("ashish", "q1") == 10.0 and system.predictor is predictor
+        assert "10.0" in system.answer_query("What is the value of Ashish in Q1?")
+    assert system.get_value("ashish", "q1") == 11.0 and system.predictor is not predictor
+
+def test_csv_watching_is_opt_in(tmp_path):
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,10,30,20,40\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    assert not any(thread.name == "csv-watcher" for thread in threading.enumerate())
+
+    system.watch_csv(0.01)
+    csv_path.write_text("Business Head,Q1,Q2,Q3,Q4\nAshish,11,30,20,40\n")
+    deadline = time.monotonic() + 5
+    while system.data_version[0] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    system.stop_watching()
+    assert "11.0" in system.answer_query("What is the value of Ashish in Q1?")
+
+# --- EXTRACTIVE QA TESTS ---
+
+def tiny_bert(path):
+    transformers = pytest.importorskip("transformers")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "the", "value", "of", "in", "is", "what", "ashish", "suhail", "q1", "q2", "."]
+    vocab += [str(d) for d in range(10)] + [f"##{d}" for d in range(10)]
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    tokenizer = transformers.BertTokenizerFast(str(path / "vocab.txt"))
+    config = transformers.BertConfig(
+        vocab_size=len(vocab), hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32
+    )
+    transformers.BertForQuestionAnswering(config).save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    return tokenizer
+
+def test_extractive_qa_batches_and_caches_contexts(tmp_path):
+    tiny_bert(tmp_path)
+    from extractive_qa import ExtractiveQA
+
+    model = ExtractiveQA(str(tmp_path), batch_size=2)
+    contexts = ["The value of ashish in Q1 is 166.", "The value of suhail in Q2 is 42."]
+    answers = model.answer(["what is ashish q1", "what is suhail q2", "what is ashish"], contexts + contexts[:1])
+    assert len(answers) == 3
+    for answer, context in zip(answers, contexts + contexts[:1]):
+        assert answer is None or answer[0] in context
+    assert model.encode_context.cache_info().hits == 1
+
+def test_training_features_are_unpadded_with_vectorized_answer_positions(tmp_path):
+    tokenizer = tiny_bert(tmp_path)
+    pytest.importorskip("datasets")
+    from train_model import preprocess
+
+    batch = {
+        "question": ["what is the value of ashish in q1", "what is suhail q2"],
+        "context": ["the value of ashish in q1 is 166.", "suhail in q2 is 42."],
+        "answers": [{"text": ["166"], "answer_start": [29]}, {"text": ["q2"], "answer_start": [10]}],
+    }
+    features = preprocess(batch, tokenizer)
+    assert [len(ids) for ids in features["input_ids"]] == features["length"]
+    for ids, start, end, answers in zip(features["input_ids"], features["start_positions"], features["end_positions"], batch["answers"]):
+        assert tokenizer.decode(ids[start:end + 1]).replace(" ", "") == answers["text"][0]
+
+class CountingEncoder:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded += texts
+        return np.array([[len(text), 1.0] for text in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+def test_reload_rebuilds_retrieval_index_in_the_background(tmp_path):
+    faiss = pytest.importorskip("faiss")
+    from types import SimpleNamespace
+    from retrieval import ContextIndex
+    csv_path = tmp_path / "heads.csv"
+    csv_path.write_text("Business Head,Q1,Q2\nAshish,10,30\nSuhail,5,9\n")
+    system = FinancialQASystem(csv_path=str(csv_path))
+    model_name = MODEL_CONFIG["retrieval_model"]
+    seed = SimpleNamespace(encoder=CountingEncoder(), model_name=model_name, sentences=[], index=faiss.IndexFlatIP(2))
+    first = ContextIndex(system.df, system.topic_column, system.sheet.digest, model_name, previous=seed)
+    system.sheet.retriever = first
+
+    csv_path.write_text("Business Head,Q1,Q2\nAshish,11,30\nSuhail,5,9\n")
+    system.reload(force=True)
+    deadline = time.monotonic() + 5
+    while system.sheet.retriever is False and time.monotonic() < deadline:
+        time.sleep(0.01)
+    rebuilt = system.sheet.retriever
+    assert rebuilt is not first and rebuilt.encoder is first.encoder
+    assert first.encoder.encoded[4:] == ["The value of ashish in Q1 is 11.0."]
+    assert "The value of ashish in Q1 is 11.0." in rebuilt.contexts(["q1"], ["ashish"], k=2)[0]
+
+def test_quarter_sentences_are_grouped_by_topic():
+    sentences, ranges = quarter_sentences(qa.df, qa.topic_column)
+    start, end = ranges["ashish"]
+    assert sentences[start] == "The value of ashish in Q1 is 1660744088.0."
+    assert all("ashish" in sentence for sentence in sentences[start:end])
+
+def test_batch_mode_streams_json_lines_in_input_order():
+    questions = [f"What is the value of Ashish in Q{i % 4 + 1}?" for i in range(12)] + ["How is business?"]
+    output = io.StringIO()
+    summary = run_batch(qa, io.StringIO("\n".join(questions) + "\n\n"), output)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [r["question"] for r in records] == questions and summary["questions"] == 13
+    assert records[1]["topic"] == "ashish" and records[1]["quarter"] == "q2"
+    assert records[1]["answer"] == qa.answer_query(questions[1]) and records[-1]["topic"] is None
+
+def test_batch_mode_parses_each_question_once():
+    system = FinancialQASystem()
+    questions = ["What is the value of Suhail in Q3?", "Forecast Robin's revenue for Q6", "How is business?"]
+    output = io.StringIO()
+    run_batch(system, io.StringIO("\n".join(questions)), output)
+    assert system.stage_stats()["parse"]["count"] == 3
+    assert [json.loads(line)["topic"] for line in output.getvalue().splitlines()] == ["suhail", "robin gupta", None]
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_batch_mode_across_processes():
+    questions = [f"What is the value of Ashish in Q{i % 4 + 1}?" for i in range(10)]
+    output = io.StringIO()
+    run_batch(FinancialQASystem(), io.StringIO("\n".join(questions)), output, workers=2)
+    answers = [json.loads(line)["answer"] for line in output.getvalue().splitlines()]
+    assert answers == [qa.answer_query(q) for q in questions]
+
+# --- SERVER TESTS ---
+
+def test_server_micro_batches_concurrent_requests():
+    questions = [f"What is the value of Ashish in Q{i % 4 + 1}?" for i in range(20)]
+
+    async def run():
+        server = QAServer(qa, workers=2, max_wait_ms=20)
+        host, port = await server.start(port=0)
+        client = InProcessClient(host, port)
+        try:
+            results = await asyncio.gather(*[client.request("POST", "/answer", {"question": q}) for q in questions])
+            _, metrics = await client.request("GET", "/metrics")
+        finally:
+            await server.stop()
+        return results, metrics
+
+    results, metrics = asyncio.run(run())
+    assert results == [(200, {"answer": qa.answer_query(q)}) for q in questions]
+    assert metrics["questions"] == 20 and metrics["batches"] < 20
+
+def test_server_errors_fail_only_their_request():
+    class FlakyQA:
+        answer_cache = qa.answer_cache
+
+        def stage_stats(self):
+            return {}
+
+        def answer_many(self, questions):
+            if "boom" in questions:
+                raise RuntimeError("boom")
+            return [q.upper() for q in questions]
+
+        def answer_query(self, question):
+            return self.answer_many([question])[0]
+
+    async def run():
+        server = QAServer(FlakyQA(), workers=1, max_wait_ms=20)
+        host, port = await server.start(port=0)
+        client = InProcessClient(host, port)
+        try:
+            results = await asyncio.gather(*[client.request("POST", "/answer", {"question": q}) for q in ["a", "boom", "b"]])
+            not_object = await client.request("POST", "/answer", ["a"])
+        finally:
+            await server.stop()
+        return results, not_object
+
+    results, not_object = asyncio.run(run())
+    assert results[0] == (200, {"answer": "A"}) and results[2] == (200, {"answer": "B"})
+    assert results[1] == (500, {"error": "RuntimeError: boom"})
+    assert not_object[0] == 400
+
+def test_shared_store_matches_private_store():
+    store = LookupStore(qa.df, qa.topic_column)
+    shared = LookupStore(qa.df, qa.topic_column).share()
+    first = shared.columns["q1"]
+    assert all(values.base is first.base for values in shared.columns.values())
+    assert not shared.changed_topics(store)
+    assert shared.get("ashish", "q1") == store.get("ashish", "q1")
+
+# --- INSTRUMENTATION TESTS ---
+
+def test_stage_timings_are_recorded_per_query():
+    system = FinancialQASystem()
+    system.answer_query("Forecast Suhail revenue for Q6")
+    system.answer_query("What is the value of Ashish in Q1?")
+    stats = system.stage_stats()
+    assert stats["total"]["count"] == 2 and stats["predict"]["count"] == 1 and stats["lookup"]["count"] == 1
+    assert stats["total"]["max_ms"] >= stats["predict"]["max_ms"]
+    assert sum(stats["parse"]["buckets_ms"].values()) == stats["parse"]["count"]
+
+# --- BENCHMARK TESTS ---
+
+def test_benchmark_corpus_covers_every_intent():
+    corpus = question_corpus(["ashish", "suhail"], per_branch=2)
+    assert {qa._intent(question.lower()) for _, question in corpus} == {"forecast", "yesno", "growth", "comparison", "lookup"}
+    assert all(qa.answer_query(question) for _, question in corpus)
+
+# --- EDGE CASES ---
+
+def test_unknown_topic():
+    result = qa.answer_query("What is the value of Ramesh in Q1?")
+    assert ("could not identify" in result.lower() or 
+            "no data" in result.lower()), f"Unexpected result: {result}"
+
+def test_missing_quarter():
+    result = qa.answer_query("How much did Ashish make?")
+    assert any(key in result.lower() for key in [
+        "could not identify", "no data", "could not find"
+    ]), f"Unexpected result: {result}"
+
+def test_ambiguous_question():
+    result = qa.answer_query("How is business?")
+    assert "could not identify" in result.lower(), f"Unexpected result: {result}"
@@ -1,88 +1,138 @@
-import json
-from datasets import Dataset
-from transformers import (
-    BertTokenizerFast,
-    BertForQuestionAnswering,
-    Trainer,
-    TrainingArguments,
-    DataCollatorWithPadding
-)
-
-model = BertForQuestionAnswering.from_pretrained("bert-base-uncased")
-tokenizer = BertTokenizerFast.from_pretrained("bert-base-uncased")
-
-with open("squad.json", "r") as f:
-    squad_data = json.load(f)
-
-examples = []
-for item in squad_data["data"]:
-    for para in item["paragraphs"]:
-        context = para["context"]
-        for qa in para["qas"]:
-            if qa["answers"]:  
-                examples.append({
-                    "id": qa["id"],
-                    "question": qa["question"],
-                    "context": context,
-                    "answers": qa["answers"][0] 
-                })
-
-dataset = Dataset.from_list(examples)
-
-def preprocess(example):
-    tokenized = tokenizer(
-        example["question"],
-        example["context"],
-        truncation="only_second",
-        max_length=384,
-        stride=128,
-        padding="max_length",
-        return_offsets_mapping=True,
-        return_tensors="pt"
-    )
-
-    offsets = tokenized["offset_mapping"][0]
-    start_char = example["answers"]["answer_start"]
-    end_char = start_char + len(example["answers"]["text"])
-
-    start_token = end_token = 0
-    for i, (start, end) in enumerate(offsets):
-        if start <= start_char < end:
-            start_token = i
-        if start < end_char <= end:
-            end_token = i
-            break
-
-    tokenized = {k: v.squeeze() for k, v in tokenized.items() if k != "offset_mapping"}
-    tokenized["start_positions"] = start_token
-    tokenized["end_positions"] = end_token
-    return tokenized
-
-tokenized_dataset = dataset.map(preprocess, remove_columns=dataset.column_names)
-tokenized_dataset.set_format(
-    type="torch",
-    columns=["input_ids", "attention_mask", "start_positions", "end_positions"]
-)
-
-training_args = TrainingArguments(
-    output_dir="./qa_finetuned",
-    num_train_epochs=3,
-    per_device_train_batch_size=2,
-    save_steps=10,
-    logging_dir="./logs",
-    logging_steps=5,
-    remove_unused_columns=False
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized_dataset,
-    tokenizer=tokenizer,
-    data_collator=DataCollatorWithPadding(tokenizer)
-)
-
-trainer.train()
-
-model.save_pretrained("./qa_finetuned")
-tokenizer.save_pretrained("./qa_finetuned")
+import argparse
+import inspect
+import os
+import time
+
+# Tokenization runs in worker processes; keep the Rust tokenizer single-threaded in each.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import numpy as np
+from datasets import load_dataset
+from transformers import (
+    AutoModelForQuestionAnswering,
+    AutoTokenizer,
+    DataCollatorWithPadding,
+    Trainer,
+    TrainingArguments
+)
+
+# Shorthands for --backbone; any Hugging Face model id or local path also works.
+BACKBONES = {
+    "bert": "bert-base-uncased",
+    "distilbert": "distilbert-base-uncased",
+}
+
+
+def answer_positions(input_ids, offsets, sep_token_id, start_chars, end_chars):
+    # input_ids (n, L) and offsets (n, L, 2) are padded "[CLS] q [SEP] c [SEP]"
+    # rows; context tokens are the ones between the first two [SEP]s.
+    sep = input_ids == sep_token_id
+    context = (np.cumsum(sep, axis=1) == 1) & ~sep
+    token_start, token_end = offsets[..., 0], offsets[..., 1]
+    start_chars, end_chars = start_chars[:, None], end_chars[:, None]
+    has_start = context & (token_start <= start_chars) & (start_chars < token_end)
+    has_end = context & (token_start < end_chars) & (end_chars <= token_end)
+    # An answer truncated out of the context points at [CLS].
+    start = np.where(has_start.any(axis=1), has_start.argmax(axis=1), 0)
+    end = np.where(has_end.any(axis=1), has_end.argmax(axis=1), 0)
+    return start, end
+
+
+def preprocess(batch, tokenizer, max_length=384):
+    encoded = tokenizer(
+        batch["question"],
+        batch["context"],
+        truncation="only_second",
+        max_length=max_length,
+        padding=True,
+        return_offsets_mapping=True,
+        return_tensors="np"
+    )
+    start_chars = np.array([answers["answer_start"][0] for answers in batch["answers"]])
+    end_chars = start_chars + np.array([len(answers["text"][0]) for answers in batch["answers"]])
+    start, end = answer_positions(
+        encoded["input_ids"], encoded["offset_mapping"], tokenizer.sep_token_id, start_chars, end_chars
+    )
+
+    # Stored unpadded; the collator pads each training batch to its longest row.
+    lengths = encoded["attention_mask"].sum(axis=1)
+    features = {
+        name: [row[:n].tolist() for row, n in zip(encoded[name], lengths)]
+        for name in tokenizer.model_input_names if name in encoded
+    }
+    features.update(start_positions=start.tolist(), end_positions=end.tolist(), length=lengths.tolist())
+    return features
+
+
+class QACollator(DataCollatorWithPadding):
+    # "length" only feeds the length-grouped sampler; the model must not see it.
+    def __call__(self, features):
+        return super().__call__([{k: v for k, v in f.items() if k != "length"} for f in features])
+
+
+def length_grouping():
+    if "train_sampling_strategy" in inspect.signature(TrainingArguments).parameters:
+        return {"train_sampling_strategy": "group_by_length"}
+    return {"group_by_length": True}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune an extractive QA model on squad.jsonl.")
+    parser.add_argument("--data", default="squad.jsonl")
+    parser.add_argument("--backbone", default="bert", help="bert, distilbert, or a model id/path")
+    parser.add_argument("--output-dir", default="./qa_finetuned")
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=384)
+    parser.add_argument("--num-proc", type=int, default=os.cpu_count(), help="tokenization processes")
+    args = parser.parse_args()
+
+    backbone = BACKBONES.get(args.backbone, args.backbone)
+    model = AutoModelForQuestionAnswering.from_pretrained(backbone)
+    tokenizer = AutoTokenizer.from_pretrained(backbone)
+
+    # squad.jsonl is written by dataset_builder.py, one example per line.
+    dataset = load_dataset("json", data_files=args.data, split="train")
+
+    start = time.perf_counter()
+    tokenized_dataset = dataset.map(
+        preprocess,
+        batched=True,
+        batch_size=1000,
+        num_proc=args.num_proc if args.num_proc and args.num_proc > 1 else None,
+        remove_columns=dataset.column_names,
+        fn_kwargs={"tokenizer": tokenizer, "max_length": args.max_length}
+    )
+    seconds = time.perf_counter() - start
+    print(f"✅ Tokenized {len(dataset)} examples in {seconds:.2f}s ({len(dataset) / seconds:.0f} examples/s)")
+
+    training_args = TrainingArguments(
+        output_dir=args.output_dir,
+        num_train_epochs=args.epochs,
+        per_device_train_batch_size=args.batch_size,
+        save_strategy="epoch",
+        logging_steps=50,
+        remove_unused_columns=False,
+        **length_grouping()
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=tokenized_dataset,
+        processing_class=tokenizer,
+        data_collator=QACollator(tokenizer)
+    )
+
+    metrics = trainer.train().metrics
+    print(
+        f"✅ Trained on {len(tokenized_dataset)} examples in {metrics['train_runtime']:.1f}s "
+        f"({metrics['train_samples_per_second']:.1f} examples/s)"
+    )
+
+    model.save_pretrained(args.output_dir)
+    tokenizer.save_pretrained(args.output_dir)
+
+
+if __name__ == "__main__":
+    main()